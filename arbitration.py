@@ -0,0 +1,70 @@
+import logging
+import time
+
+from config import Config
+from metrics import Metrics
+from records import Ticker
+
+'''
+Consolidated ticker feed. Every pair is served by the best ranked exchange
+that sent a ticker for it within Config.arbitration_STALENESS seconds:
+Config.ticker_PRIORITY_EXCHANGE first, then Config.ticker_SECONDARY_EXCHANGES
+in order, then any other exchange. Freshness is tracked per pair, so a stale
+pair on the priority exchange fails over without affecting the other pairs.
+'''
+
+
+class Arbiter:
+    '''
+    sits in front of the sinks and forwards only the tickers and ticker windows
+    of the active exchange of each pair, other collections are forwarded as they are.
+    A window is emitted right after the ticker of its pair, which decides the source.
+    '''
+
+    def __init__(self, sinks: list, priority: str = Config.ticker_PRIORITY_EXCHANGE,
+                 secondaries: list = Config.ticker_SECONDARY_EXCHANGES,
+                 staleness: float = Config.arbitration_STALENESS):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.name = "arbiter"
+        self.sinks = sinks
+        self.staleness = staleness
+        ranking = [priority] + [exchange for exchange in secondaries if exchange != priority]
+        self.ranks = {exchange: rank for rank, exchange in enumerate(ranking)}
+        # pair -> {source: last seen}
+        self.last_seen = {}
+        # pair -> source currently forwarded
+        self.active = {}
+        self.metrics = Metrics()
+
+    def __rank(self, source: str) -> int:
+        return self.ranks.get(source, len(self.ranks))
+
+    def accept(self, ticker: Ticker, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        seen = self.last_seen.setdefault(ticker.pair, {})
+        seen[ticker.source] = now
+        rank = self.__rank(ticker.source)
+        for source, last in seen.items():
+            if self.__rank(source) < rank and now - last <= self.staleness:
+                return False
+        previous = self.active.get(ticker.pair)
+        if previous != ticker.source:
+            self.active[ticker.pair] = ticker.source
+            if previous is not None:
+                self.metrics.arbitration_failovers.inc(pair=ticker.pair, source=ticker.source)
+                self.logger.info(f"{ticker.pair} now served by {ticker.source}, was {previous}")
+        return True
+
+    async def insert(self, collection: str, record):
+        if collection == "tickers" and not self.accept(record):
+            self.metrics.arbitration_discarded.inc(exchange=record.source)
+            return
+        if collection == "ticker_windows" and self.active.get(record.pair) != record.source:
+            self.metrics.arbitration_discarded.inc(exchange=record.source)
+            return
+        for sink in self.sinks:
+            await sink.insert(collection, record)
+
+    def stats(self) -> dict:
+        return dict(self.active)
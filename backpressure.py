@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import traceback
+from collections import OrderedDict, deque
+
+from config import Config
+from metrics import Metrics
+from records import Ticker
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+CONFLATE = "conflate"
+POLICIES = (BLOCK, DROP_OLDEST, CONFLATE)
+
+
+class FeedQueue:
+    '''
+    Bounded queue between one exchange reader and the sinks, drained by its
+    own dispatcher task. Records are kept in order until the queue is full,
+    then the overflow policy decides: block waits for room, drop_oldest
+    discards the oldest record, conflate keeps only the newest ticker of every
+    (source, pair) in the place of its oldest pending one (candles are
+    conflated per bar). The oldest record is dropped only when every pending
+    record belongs to a different pair.
+    '''
+
+    def __init__(self, name: str, sinks: list, maxsize: int = Config.feed_QUEUE_SIZE, policy: str = None):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        policy = policy or Config.feed_OVERFLOW_POLICIES.get(name, Config.feed_OVERFLOW_POLICY)
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy}, expected one of {POLICIES}")
+        self.name = name
+        self.sinks = sinks
+        self.maxsize = maxsize
+        self.policy = policy
+        # sequence -> (collection, record, group)
+        self.items = OrderedDict()
+        self.sequence = 0
+        # conflate only: group -> sequences pending, oldest first, and the groups with more than one
+        self.groups = {}
+        self.duplicated = set()
+        self.not_empty = asyncio.Event()
+        self.not_full = asyncio.Event()
+        self.not_full.set()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.task = None
+        self.shed = 0
+        self.metrics = Metrics()
+
+    def qsize(self) -> int:
+        return len(self.items)
+
+    def __group(self, collection: str, record):
+        if self.policy != CONFLATE:
+            return None
+        if isinstance(record, Ticker):
+            return (collection, record.source, record.pair)
+        return (collection, record.key())
+
+    def __shed(self):
+        self.shed += 1
+        self.metrics.records_shed.inc(exchange=self.name, policy=self.policy)
+
+    def __forget(self, group):
+        # the oldest record of a group always leaves first
+        if group is None:
+            return
+        sequences = self.groups[group]
+        sequences.popleft()
+        if len(sequences) < 2:
+            self.duplicated.discard(group)
+        if not sequences:
+            del self.groups[group]
+
+    def __pop(self) -> tuple:
+        _sequence, (collection, record, group) = self.items.popitem(last=False)
+        self.__forget(group)
+        return collection, record
+
+    def __collapse(self, group):
+        # the oldest pending record of the group takes the newest one, the others go
+        sequences = self.groups[group]
+        newest = sequences.pop()
+        self.items[sequences[0]] = self.items.pop(newest)
+        self.__shed()
+        while len(sequences) > 1:
+            del self.items[sequences.pop()]
+            self.__shed()
+
+    def __conflate(self, collection: str, record, group) -> bool:
+        for other in self.duplicated:
+            self.__collapse(other)
+        self.duplicated.clear()
+        sequences = self.groups.get(group)
+        if sequences:
+            self.items[sequences[0]] = (collection, record, group)
+            self.__shed()
+            return True
+        if len(self.items) >= self.maxsize:
+            # every pending record is the only one of its group
+            self.__pop()
+            self.__shed()
+        return False
+
+    async def put(self, collection: str, record):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.__dispatcher())
+        group = self.__group(collection, record)
+        if group is not None and len(self.items) >= self.maxsize:
+            if self.__conflate(collection, record, group):
+                return
+        while len(self.items) >= self.maxsize:
+            if self.policy == BLOCK:
+                self.not_full.clear()
+                await self.not_full.wait()
+            else:
+                self.__pop()
+                self.__shed()
+        self.sequence += 1
+        self.items[self.sequence] = (collection, record, group)
+        if group is not None:
+            sequences = self.groups.setdefault(group, deque())
+            sequences.append(self.sequence)
+            if len(sequences) > 1:
+                self.duplicated.add(group)
+        self.idle.clear()
+        self.not_empty.set()
+
+    async def __dispatcher(self):
+        while True:
+            await self.not_empty.wait()
+            collection, record = self.__pop()
+            if not self.items:
+                self.not_empty.clear()
+            self.not_full.set()
+            await self.__dispatch(collection, record)
+            if not self.items:
+                self.idle.set()
+
+    async def __dispatch(self, collection: str, record):
+        for sink in self.sinks:
+            try:
+                await sink.insert(collection, record)
+            except Exception as e:
+                self.logger.error(f"Error dispatching {self.name} record to {sink.name}:{e}->{traceback.format_exc()}")
+
+    async def close(self, timeout: float = Config.sink_CLOSE_TIMEOUT):
+        # pending records are handed to the sinks before they are closed
+        if self.task is not None:
+            try:
+                await asyncio.wait_for(self.idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.logger.error(f"{self.name} feed queue close timeout, {len(self.items)} records pending")
+            self.task.cancel()
+            self.task = None
+        while self.items:
+            collection, record = self.__pop()
+            await self.__dispatch(collection, record)
+        self.not_empty.clear()
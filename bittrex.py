@@ -1,93 +1,252 @@
 import logging
 import asyncio
-import json
+import websockets
+import codec
+import base64
+import zlib
 import traceback
-import sys
-import time
-from collections import defaultdict
-from pymongo import MongoClient
-from aiohttp import ClientSession
-from mongodb import MongoDataBase
-from mysqldb import MysqlDataBase
+from urllib.parse import quote as urlquote
+from email.utils import parsedate_to_datetime
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
 
-from datetime import datetime
+from records import Ticker
+from timeutil import stamp
+from symbols import SymbolRegistry
 
 
 from config import Config
 from exchange import Exchange
 
+
+class RateLimiter:
+    '''
+    spaces request starts to at most rate per second,
+    a 429 answer pushes every pending request after Retry-After
+    '''
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def backoff(self, seconds: float):
+        loop = asyncio.get_running_loop()
+        self.next_slot = max(self.next_slot, loop.time() + seconds)
+
+
 class Bittrex(Exchange):
 
-    def __init__(self, mongodb: MongoDataBase, mysqldb: MysqlDataBase, pairs_to_record: list):
+    name = "bittrex"
+
+    def __init__(self, sinks: list, pairs_to_record: list, channels: list = None):
+
+        super().__init__(sinks)
 
         self.logger = logging.getLogger(
             Config.LOGGING_NAME + "." + str(__name__))
         self.logger.debug(f"Init {str(__name__)}")
-        
-        self.mongodb = mongodb
-        self.mysqldb = mysqldb
-        self.logger.debug(f"mongodb id:{id(self.mongodb)}")
-        self.logger.debug(f"mysqldb id:{id(self.mysqldb)}")
+        self.logger.debug(f"sinks:{[sink.name for sink in self.sinks]}")
 
-        self.min_diff_to_insert = 10
+        self.poll_interval = 10
         
-        self.pairs_to_record =  [ quote + "-" + base for base,quote in pairs_to_record]
+        self.symbols = SymbolRegistry()
+        self.pairs = list(pairs_to_record)
+        self.pairs_to_record = [self.symbols.instrument(self.name, base, quote).symbol for base, quote in self.pairs]
+        self.base_url = "https://api.bittrex.com/v3/markets/"
+        self.rate_limiter = RateLimiter(Config.bittrex_REQUESTS_PER_SECOND)
+        self.hub = "c3"
+        self.invocation_id = 0
 
-    def __parse_ticker_response(self,response: dict) -> dict:
+    def __parse_ticker_response(self,response: dict) -> Ticker:
 
         if type(response) == dict and "code" not in response:
             return self.__parse_ticker(response)
         else:
             return None
     
-    def __parse_ticker(self, ticker: dict) -> dict:
+    def __parse_ticker(self, ticker: dict) -> Ticker:
         if type(ticker) == dict:
             if all( (key in ticker for key in ['symbol','lastTradeRate',"bidRate","askRate"]) ):
-                new_ticker = {}
-                quote,base = ticker['symbol'].split("-")
-                new_ticker['source'] = "bittrex"
-                new_ticker['epoch'] = int(time.time())
-                new_ticker['ts'] = datetime.utcfromtimestamp(new_ticker['epoch']).strftime('%Y-%m-%d %H:%M:%S')
-                new_ticker['pair'] = base + "_" + quote
-                new_ticker['last'] = float(ticker['lastTradeRate'])
-                new_ticker['ask'] = float(ticker['askRate'])
-                new_ticker['bid'] = float(ticker['bidRate'])
-                return new_ticker 
+                instrument = self.symbols.by_symbol(self.name, ticker['symbol'])
+                if instrument is None:
+                    return None
+                epoch, epoch_ms = stamp()
+                return Ticker(source=self.name,
+                              pair=instrument.pair,
+                              epoch=epoch,
+                              last=float(ticker['lastTradeRate']),
+                              ask=float(ticker['askRate']),
+                              bid=float(ticker['bidRate']),
+                              epoch_ms=epoch_ms)
         else:
             return None
     
-    async def get_tickers(self,lock):
-        #base_url = "https://api.bittrex.com/api/v1.1/public/getticker?market="
-        base_url = "https://api.bittrex.com/v3/markets/"
+    async def __get(self, session: ClientSession, url: str):
+        await self.rate_limiter.acquire()
+        async with session.get(url) as response:
+            if response.status == 429:
+                retry_after = float(response.headers.get("Retry-After", self.poll_interval))
+                self.logger.warning(f"Bittrex rate limit, retry after {retry_after}s")
+                self.rate_limiter.backoff(retry_after)
+                return None
+            self.metrics.messages_received.inc(exchange=self.name)
+            # the Date header is the exchange clock, whole seconds
+            date = response.headers.get("Date")
+            self.health.message(self.name, parsedate_to_datetime(date).timestamp() if date else None)
+            return codec.loads(await response.read())
+
+    async def __get_ticker(self, session: ClientSession, pair: str) -> dict:
         #/markets/{marketSymbol}/ticker
+        response = await self.__get(session, self.base_url + pair + "/ticker")
+        return self.__parse_ticker_response(response)
+
+    async def __get_all_tickers(self, session: ClientSession) -> list:
+        response = await self.__get(session, self.base_url + "tickers")
+        if type(response) != list:
+            return []
+        pairs = set(self.pairs_to_record)
+        return [self.__parse_ticker(ticker) for ticker in response if type(ticker) == dict and ticker.get('symbol') in pairs]
+
+    async def __poll(self, session: ClientSession) -> list:
+        if len(self.pairs_to_record) >= Config.bittrex_BULK_THRESHOLD:
+            return await self.__get_all_tickers(session)
+        results = await asyncio.gather(
+            *(self.__get_ticker(session, pair) for pair in self.pairs_to_record), return_exceptions=True)
+        tickers = []
+        for pair, result in zip(self.pairs_to_record, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Exception getting {pair} ticker:{result!r}")
+            else:
+                tickers.append(result)
+        return tickers
+
+    def __decode_message(self, data: str):
+        # hub payloads are base64 raw deflate json
+        return codec.loads(zlib.decompress(base64.b64decode(data), -zlib.MAX_WBITS))
+
+    async def __negotiate(self) -> tuple:
+        '''
+        classic SignalR (clientProtocol 1.5) handshake, returns the websocket uri.
+        Without negotiation bittrex_SOCKET_URL is used as is, e.g. a local mock server.
+        '''
+        url = Config.bittrex_SOCKET_URL
+        if not Config.bittrex_SOCKET_NEGOTIATE:
+            return url, None
+        connection_data = urlquote(codec.dumps([{"name": self.hub}]))
+        timeout = ClientTimeout(total=Config.bittrex_REQUEST_TIMEOUT)
+        async with ClientSession(timeout=timeout) as session:
+            async with session.get(f"{url}/negotiate?clientProtocol=1.5&connectionData={connection_data}") as response:
+                negotiation = codec.loads(await response.read())
+        token = urlquote(negotiation['ConnectionToken'])
+        query = f"clientProtocol=1.5&transport=webSockets&connectionToken={token}&connectionData={connection_data}"
+        ws_uri = url.replace("https://", "wss://", 1) + "/connect?" + query + "&tid=10"
+        start_url = f"{url}/start?{query}"
+        return ws_uri, start_url
+
+    async def __invoke(self, websocket, method: str, *args):
+        self.invocation_id += 1
+        data = {"H": self.hub, "M": method, "A": list(args), "I": self.invocation_id}
+        await websocket.send(codec.dumps(data))
+
+    async def update_pairs(self, added: list, removed: list):
+        # the REST poll reads pairs_to_record on every cycle
+        self.pairs_to_record = [self.symbols.instrument(self.name, base, quote).symbol for base, quote in self.pairs]
+        websocket = self.websocket
+        if websocket is None:
+            return
+        try:
+            if added:
+                await self.__invoke(websocket, "Subscribe",
+                                    ["ticker_" + self.symbols.instrument(self.name, base, quote).symbol for base, quote in added])
+            if removed:
+                await self.__invoke(websocket, "Unsubscribe",
+                                    ["ticker_" + self.symbols.instrument(self.name, base, quote).symbol for base, quote in removed])
+        except websockets.exceptions.ConnectionClosed:
+            # the next connection subscribes pairs_to_record
+            pass
+
+    async def __stream_tickers(self):
+        ws_uri, start_url = await self.__negotiate()
+        self.logger.debug("Starting stream connection with Bittrex")
+        async with websockets.connect(ws_uri) as websocket:
+            if start_url is not None:
+                timeout = ClientTimeout(total=Config.bittrex_REQUEST_TIMEOUT)
+                async with ClientSession(timeout=timeout) as session:
+                    async with session.get(start_url) as response:
+                        await response.read()
+            channels = ["heartbeat"] + ["ticker_" + pair for pair in self.pairs_to_record]
+            await self.__invoke(websocket, "Subscribe", channels)
+            self.websocket = websocket
+            while True:
+                timer = self.profiler.timer(self.name)
+                # Bittrex sends a heartbeat every few seconds, silence means a dead socket
+                r = await asyncio.wait_for(websocket.recv(), Config.bittrex_STREAM_TIMEOUT)
+                if timer:
+                    timer.mark("recv")
+                self.metrics.messages_received.inc(exchange=self.name)
+                self.health.message(self.name)
+                response = codec.loads(r)
+                if timer:
+                    timer.mark("json.loads")
+                if type(response) != dict:
+                    continue
+                if "R" in response:
+                    self.logger.debug(f"Bittrex invocation result:{response}")
+                    continue
+                for message in response.get("M", []):
+                    if message.get("M") != "ticker":
+                        continue
+                    for data in message.get("A", []):
+                        ticker = self.__parse_ticker_response(self.__decode_message(data))
+                        if timer:
+                            timer.mark("parse")
+                        if ticker is not None:
+                            self.metrics.messages_parsed.inc(exchange=self.name, pair=ticker.pair)
+                            await self.insert_ticker(ticker)
+
+    async def get_tickers(self):
+        if not Config.bittrex_STREAMING:
+            await self.__poll_tickers()
+            return
         while True:
             try:
-                async with ClientSession() as session:
-                    for pair  in self.pairs_to_record:
-                        async with session.get(base_url + pair + "/ticker") as response:
-                            response = await response.read()
-                            response = json.loads(response)
-                            ticker = self.__parse_ticker_response(response)
-                            if ticker is not None:
-                                try:
-                                    async with lock:
-                                        self.mongodb.insert("tickers",ticker)
-                                except Exception as e:
-                                    self.logger.error(f"Exception in Insert MongoDataBase:{e}->{traceback.format_exc()}")
-                                    return
-                                
-                                try:
-                                    async with lock:
-                                        self.mysqldb.insert("tickers",ticker)
-                                except Exception as e:
-                                    self.logger.error(f"Exception in Insert MysqlDataBase:{e}->{traceback.format_exc()}")
-                                    return
-                            await asyncio.sleep(1)
+                await self.__stream_tickers()
+            except Exception as e:
+                self.logger.error(f"Exception in Bittrex stream:{e}->{traceback.format_exc()}")
+            self.websocket = None
+            self.metrics.reconnects.inc(exchange=self.name)
+            self.logger.info(f"Connection lost with Bittrex stream, REST polling for {Config.bittrex_STREAM_RETRY}s")
+            try:
+                await asyncio.wait_for(self.__poll_tickers(), Config.bittrex_STREAM_RETRY)
+            except asyncio.TimeoutError:
+                pass
 
+    async def __poll_tickers(self):
+        #base_url = "https://api.bittrex.com/api/v1.1/public/getticker?market="
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                connector = TCPConnector(limit=Config.bittrex_MAX_CONNECTIONS, keepalive_timeout=60)
+                timeout = ClientTimeout(total=Config.bittrex_REQUEST_TIMEOUT)
+                async with ClientSession(connector=connector, timeout=timeout) as session:
+                    while True:
+                        cycle_start = loop.time()
+                        for ticker in await self.__poll(session):
+                            if ticker is not None:
+                                self.metrics.messages_parsed.inc(exchange=self.name, pair=ticker.pair)
+                                await self.insert_ticker(ticker)
+                        elapsed = loop.time() - cycle_start
+                        if elapsed > self.poll_interval:
+                            self.logger.warning(f"Bittrex poll cycle took {elapsed:.2f}s")
+                        await asyncio.sleep(max(0, self.poll_interval - elapsed))
 
             except Exception as e:
                 self.logger.error(f"Exception:{e}->{traceback.format_exc()}")
                 await asyncio.sleep(60)
-
-           
-            await asyncio.sleep(self.min_diff_to_insert)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+import traceback
+
+from config import Config
+from metrics import Metrics
+from records import Ticker, Candle
+
+# bar slots: open, high, low, close, first tick time, last tick time
+OPEN, HIGH, LOW, CLOSE, FIRST, LAST = range(6)
+
+
+class CandleBuilder:
+    '''
+    Builds OHLC candles for every frame in Config.candles_FRAMES from the
+    last price of a ticker stream. An update touches one bar per frame.
+    Ticks are placed by their own time, so late or out of order ticks still
+    land in their bar as long as it is not older than grace seconds past
+    its end. Closed bars are emitted together every flush_interval seconds.
+    On close the open bars are emitted too, the sinks merge them with the
+    rest of the bar written after a restart (Candle.merge).
+    Tickers carry no traded volume, volume is stored as 0.
+    '''
+
+    def __init__(self, name: str, emit, frames: list = Config.candles_FRAMES,
+                 grace: float = Config.candles_GRACE,
+                 flush_interval: float = Config.candles_FLUSH_INTERVAL):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.name = name
+        self.emit = emit
+        self.frames = tuple(frames)
+        self.grace = grace
+        self.flush_interval = flush_interval
+        # (pair, frame, start) -> bar
+        self.bars = {}
+        self.task = None
+        self.late = 0
+        self.emitted = 0
+        self.metrics = Metrics()
+
+    def update(self, ticker: Ticker, now: float = None):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.__run())
+        now = time.time() if now is None else now
+        tick = ticker.epoch if ticker.epoch_ms is None else ticker.epoch_ms / 1000
+        price = ticker.last
+        for frame in self.frames:
+            start = int(tick // frame * frame)
+            if start + frame + self.grace <= now:
+                # the bar is flushed or about to be
+                self.late += 1
+                self.metrics.candles_late.inc(exchange=self.name, frame=frame)
+                continue
+            key = (ticker.pair, frame, start)
+            bar = self.bars.get(key)
+            if bar is None:
+                self.bars[key] = [price, price, price, price, tick, tick]
+                continue
+            if price > bar[HIGH]:
+                bar[HIGH] = price
+            elif price < bar[LOW]:
+                bar[LOW] = price
+            if tick >= bar[LAST]:
+                bar[CLOSE] = price
+                bar[LAST] = tick
+            elif tick < bar[FIRST]:
+                bar[OPEN] = price
+                bar[FIRST] = tick
+
+    def closed(self, now: float) -> list:
+        candles = []
+        for key in [key for key in self.bars if key[2] + key[1] + self.grace <= now]:
+            pair, frame, start = key
+            bar = self.bars.pop(key)
+            candles.append(Candle(source=self.name, pair=pair, frame=frame, epoch=start,
+                                  open=bar[OPEN], high=bar[HIGH], low=bar[LOW], close=bar[CLOSE], volume=0.0))
+        return candles
+
+    async def flush(self, now: float = None):
+        now = time.time() if now is None else now
+        for candle in self.closed(now):
+            try:
+                await self.emit("candles", candle)
+            except Exception as e:
+                self.logger.error(f"Error emitting {self.name} candle {candle}:{e}->{traceback.format_exc()}")
+            else:
+                self.emitted += 1
+
+    def stats(self) -> dict:
+        return {'open_bars': len(self.bars), 'emitted': self.emitted, 'late': self.late}
+
+    async def __run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        # every bar is written, ended or not, without waiting for the grace period
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush(float("inf"))
@@ -0,0 +1,36 @@
+import importlib
+import json
+import logging
+
+from config import Config
+
+'''
+JSON codec used by the exchange loops. Picks the fastest decoder installed
+(orjson, msgspec, ujson) and falls back to the stdlib json module.
+Config.JSON_CODEC forces one of them by name.
+'''
+
+PREFERENCE = ("orjson", "msgspec", "ujson", "json")
+
+
+def build(name: str) -> tuple:
+    module = importlib.import_module("msgspec.json" if name == "msgspec" else name)
+    if name == "orjson":
+        return module.loads, lambda obj: module.dumps(obj).decode()
+    if name == "msgspec":
+        return module.decode, lambda obj: module.encode(obj).decode()
+    return module.loads, module.dumps
+
+
+def select(name: str = None) -> tuple:
+    for candidate in ((name,) if name else PREFERENCE):
+        try:
+            return (candidate,) + build(candidate)
+        except ImportError:
+            continue
+    logging.getLogger(Config.LOGGING_NAME + "." + str(__name__)).warning(
+        f"JSON codec {name} not installed, using json")
+    return ("json", json.loads, json.dumps)
+
+
+NAME, loads, dumps = select(Config.JSON_CODEC)
@@ -1,3 +1,99 @@
 class Config:
     LOGGING_NAME = "ws_tickers"
-    ticker_PRIORITY_EXCHANGE = "poloniex"
\ No newline at end of file
+    ticker_PRIORITY_EXCHANGE = "poloniex"
+    # failover order when the priority exchange is stale for a pair
+    ticker_SECONDARY_EXCHANGES = ["bittrex"]
+    arbitration_STALENESS = 60
+    sink_QUEUE_SIZE = 10000
+    sink_CLOSE_TIMEOUT = 10
+    mysql_BATCH_SIZE = 100
+    mysql_FLUSH_INTERVAL = 1.0
+    mongo_BATCH_SIZE = 100
+    mongo_FLUSH_INTERVAL = 1.0
+    bittrex_MAX_CONNECTIONS = 10
+    bittrex_REQUEST_TIMEOUT = 5
+    bittrex_REQUESTS_PER_SECOND = 5
+    bittrex_BULK_THRESHOLD = 10
+    bittrex_STREAMING = True
+    bittrex_SOCKET_URL = "https://socket-v3.bittrex.com/signalr"
+    bittrex_SOCKET_NEGOTIATE = True
+    bittrex_STREAM_TIMEOUT = 60
+    bittrex_STREAM_RETRY = 300
+    supervisor_BASE_DELAY = 1
+    supervisor_MAX_DELAY = 120
+    supervisor_RESET_AFTER = 300
+    monitor_LAG_INTERVAL = 0.5
+    health_MAX_MESSAGE_AGE = 60
+    health_MAX_INSERT_AGE = 120
+    health_MAX_LATENCY = 30
+    monitor_LAG_WARNING = 0.25
+    profiler_SAMPLE_EVERY = 100
+    profiler_WINDOW = 1000
+    profiler_LOG_INTERVAL = 300
+    poloniex_WS_URI = "wss://api2.poloniex.com"
+    gemini_WS_URI = "wss://api.gemini.com/v2/marketdata"
+    # adds epoch_ms to tickers, the tickers table needs the epoch_ms column.
+    # Always on when conflation_INTERVAL is 0, see timeutil.milliseconds
+    TIMESTAMP_MILLISECONDS = False
+    TS_CACHE_SIZE = 4096
+    # None picks the fastest installed of orjson, msgspec, ujson, json
+    JSON_CODEC = None
+    pairs_TICKERS = [("USDT","BTC"),("USDT","ETH")]
+    pairs_CANDLES = [("USD","BTC"),("USD","ETH")]
+    # None runs every feed in this process, e.g. [["poloniex"], ["gemini", "bittrex"]] one worker process per list
+    PROCESS_SHARDS = None
+    shard_QUEUE_SIZE = 1000
+    shard_BATCH_SIZE = 100
+    shard_FLUSH_INTERVAL = 0.1
+    shard_HEARTBEAT_INTERVAL = 1
+    # seconds a worker gets to close its feeds and send its last records on shut down
+    shard_STOP_TIMEOUT = 10
+    spool_ENABLED = True
+    spool_DIRECTORY = "./spool"
+    spool_SEGMENT_BYTES = 8 * 1024 * 1024
+    spool_MAX_BYTES = 1024 * 1024 * 1024
+    spool_FSYNC_INTERVAL = 1.0
+    spool_MMAP = True
+    spool_REPLAY_INTERVAL = 5
+    spool_REPLAY_BATCH_SIZE = 1000
+    feed_QUEUE_SIZE = 1000
+    # block, drop_oldest or conflate, feed_OVERFLOW_POLICIES overrides it per exchange
+    feed_OVERFLOW_POLICY = "conflate"
+    feed_OVERFLOW_POLICIES = {}
+    # tickers are conflated per pair and the latest one emitted every interval seconds, 0 stores every ticker
+    conflation_INTERVAL = 10
+    # also store min/max/last/count of last, bid and ask per window in ticker_windows
+    conflation_WINDOWS = False
+    # candles built from the ticker streams, frames in seconds, empty to disable
+    candles_FRAMES = [60, 300, 900, 3600]
+    # late ticks are accepted until grace seconds after the end of their bar
+    candles_GRACE = 5
+    candles_FLUSH_INTERVAL = 1
+    # tables partitioned by RANGE on epoch, see sql/migrations/0002_partitioned_tables.sql
+    mysql_PARTITIONED_TABLES = ["tickers", "candles", "ticker_windows"]
+    # day or month
+    mysql_PARTITION_PERIOD = "day"
+    mysql_PARTITIONS_AHEAD = 7
+    # days kept per table, old partitions are dropped, None keeps everything
+    mysql_RETENTION_DAYS = {"tickers": 90, "candles": None, "ticker_windows": 90}
+    mysql_PARTITION_CHECK_INTERVAL = 3600
+    # mongo collections set up at start up. timeseries needs MongoDB 5.0+, without it (or when
+    # False) a compound {pair, source, epoch} index is used. retention_days None keeps everything.
+    # Plain collections drop records stored twice (spool replay, retried batches) by the unique
+    # _id record key. Time series collections store less but do not enforce a unique _id,
+    # replayed records are stored again. Candles are upserted, keep them out of time series.
+    mongo_COLLECTIONS = {
+        "tickers": {"timeseries": False, "retention_days": 90},
+        "candles": {"timeseries": False, "retention_days": None},
+        "ticker_windows": {"timeseries": False, "retention_days": 90},
+    }
+    symbols_SNAPSHOT = "./json/symbols.json"
+    # seconds between background refreshes of the exchange markets, None only loads the snapshot
+    symbols_REFRESH_INTERVAL = None
+    symbols_REFRESH_TIMEOUT = 10
+    symbols_MIN_REFRESH_INTERVAL = 60
+    # exchanges, channels, pairs and sinks, see feeds.py
+    FEEDS_FILE = "./feeds.json"
+    feeds_RELOAD_INTERVAL = 10
+    # modules with more Exchange plugins, e.g. ["kraken"]
+    EXCHANGE_PLUGINS = []
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+import traceback
+
+from config import Config
+from records import Ticker, TickerWindow
+
+# window slots: count, last_min, last_max, bid_min, bid_max, ask_min, ask_max
+COUNT, LAST_MIN, LAST_MAX, BID_MIN, BID_MAX, ASK_MIN, ASK_MAX = range(7)
+
+
+class Conflator:
+    '''
+    Keeps the latest ticker per (source, pair) and emits it once per window,
+    windows are aligned to multiples of interval seconds. Only pairs updated
+    during the window are emitted. With windows enabled a TickerWindow with
+    the min/max/last/count of the window is emitted as well.
+    update() is O(1) and never awaits, emit is a coroutine (collection, record).
+    '''
+
+    def __init__(self, name: str, emit, interval: int = Config.conflation_INTERVAL,
+                 windows: bool = Config.conflation_WINDOWS):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.name = name
+        self.emit = emit
+        self.interval = interval
+        self.latest = {}
+        self.windows = {} if windows else None
+        self.window_start = self.__window_start(time.time())
+        self.task = None
+        self.updates = 0
+        self.emitted = 0
+
+    def __window_start(self, now: float) -> int:
+        return int(now // self.interval * self.interval)
+
+    def update(self, ticker: Ticker):
+        if self.task is None or self.task.done():
+            self.window_start = self.__window_start(time.time())
+            self.task = asyncio.create_task(self.__run())
+        key = (ticker.source, ticker.pair)
+        self.latest[key] = ticker
+        self.updates += 1
+        if self.windows is None:
+            return
+        window = self.windows.get(key)
+        if window is None:
+            self.windows[key] = [1, ticker.last, ticker.last, ticker.bid, ticker.bid, ticker.ask, ticker.ask]
+            return
+        window[COUNT] += 1
+        if ticker.last < window[LAST_MIN]:
+            window[LAST_MIN] = ticker.last
+        elif ticker.last > window[LAST_MAX]:
+            window[LAST_MAX] = ticker.last
+        if ticker.bid < window[BID_MIN]:
+            window[BID_MIN] = ticker.bid
+        elif ticker.bid > window[BID_MAX]:
+            window[BID_MAX] = ticker.bid
+        if ticker.ask < window[ASK_MIN]:
+            window[ASK_MIN] = ticker.ask
+        elif ticker.ask > window[ASK_MAX]:
+            window[ASK_MAX] = ticker.ask
+
+    def stats(self) -> dict:
+        return {'pairs': len(self.latest), 'updates': self.updates, 'emitted': self.emitted}
+
+    async def flush(self):
+        latest, self.latest = self.latest, {}
+        windows = None
+        if self.windows is not None:
+            windows, self.windows = self.windows, {}
+        window_start, self.window_start = self.window_start, self.__window_start(time.time())
+        for key, ticker in latest.items():
+            try:
+                await self.emit("tickers", ticker)
+                if windows is not None and key in windows:
+                    window = windows[key]
+                    await self.emit("ticker_windows", TickerWindow(
+                        source=ticker.source, pair=ticker.pair, frame=self.interval, epoch=window_start,
+                        count=window[COUNT],
+                        last_min=window[LAST_MIN], last_max=window[LAST_MAX], last=ticker.last,
+                        bid_min=window[BID_MIN], bid_max=window[BID_MAX], bid=ticker.bid,
+                        ask_min=window[ASK_MIN], ask_max=window[ASK_MAX], ask=ticker.ask))
+            except Exception as e:
+                self.logger.error(f"Error emitting {self.name} {key}:{e}->{traceback.format_exc()}")
+            else:
+                self.emitted += 1
+
+    async def __run(self):
+        while True:
+            now = time.time()
+            await asyncio.sleep(self.window_start + self.interval - now)
+            await self.flush()
+
+    async def close(self):
+        # the current partial window is emitted
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush()
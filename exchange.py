@@ -1,7 +1,77 @@
 from abc import ABC,abstractmethod
 
+from metrics import Metrics
+from health import Health
+from profiler import Profiler
+from backpressure import FeedQueue
+from conflation import Conflator
+from candles import CandleBuilder
+from config import Config
+
+# exchange plugins by name, every Exchange subclass with a name registers itself
+EXCHANGES = {}
+
+
 class Exchange(ABC):
 
+    name = None
+    # channels the exchange can record, the first one is the default
+    channels = ("ticker",)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.name is not None:
+            EXCHANGES[cls.name] = cls
+
+    def __init__(self, sinks: list):
+        self.sinks = sinks
+        # (base, quote) pairs recorded, changed at run time with set_pairs
+        self.pairs = []
+        # open websocket, used to subscribe and unsubscribe pairs without reconnecting
+        self.websocket = None
+        self.queue = FeedQueue(self.name, sinks)
+        self.conflator = Conflator(self.name, self.insert) if Config.conflation_INTERVAL else None
+        self.candle_builder = CandleBuilder(self.name, self.insert) if Config.candles_FRAMES else None
+        self.metrics = Metrics()
+        self.health = Health()
+        self.profiler = Profiler()
+        self.health.register_exchange(self.name)
+
+    async def insert(self, collection: str, record):
+        # records are immutable, every sink gets the same object from the feed queue
+        await self.queue.put(collection, record)
+
+    async def insert_ticker(self, ticker):
+        if self.candle_builder is not None:
+            self.candle_builder.update(ticker)
+        if self.conflator is None:
+            await self.insert("tickers", ticker)
+        else:
+            self.conflator.update(ticker)
+
+    async def set_pairs(self, pairs: list):
+        pairs = [tuple(pair) for pair in pairs]
+        added = [pair for pair in pairs if pair not in self.pairs]
+        removed = [pair for pair in self.pairs if pair not in pairs]
+        if not added and not removed:
+            return
+        self.pairs = pairs
+        await self.update_pairs(added, removed)
+        self.logger.info(f"{self.name} pairs updated, added:{added} removed:{removed}")
+
+    async def update_pairs(self, added: list, removed: list):
+        '''
+        applies a change of self.pairs to the running feed
+        '''
+        pass
+
+    async def close(self):
+        if self.candle_builder is not None:
+            await self.candle_builder.close()
+        if self.conflator is not None:
+            await self.conflator.close()
+        await self.queue.close()
+
     @abstractmethod
     def get_tickers():
         pass
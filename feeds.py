@@ -0,0 +1,144 @@
+import asyncio
+import importlib
+import json
+import logging
+import os
+import traceback
+
+from config import Config
+from exchange import EXCHANGES
+# built in exchange plugins, importing them registers them
+import poloniex
+import gemini
+import bittrex
+
+'''
+Declarative feed config: exchanges with their channels and pairs, and the
+sinks to write to. Read from Config.FEEDS_FILE (a json file), then from the
+environment:
+    WS_TICKERS_FEEDS_FILE=/etc/ws_tickers/feeds.json
+    WS_TICKERS_EXCHANGES=poloniex,gemini      only these exchanges
+    WS_TICKERS_SINKS=mysqldb
+    WS_TICKERS_POLONIEX_PAIRS=USDT_BTC,USDT_ETH
+Pairs are normalized names, base_quote. Without a file the pairs of
+Config.pairs_TICKERS and Config.pairs_CANDLES are used.
+'''
+
+ENV_PREFIX = "WS_TICKERS_"
+SINKS = ("mongodb", "mysqldb")
+
+logger = logging.getLogger(Config.LOGGING_NAME + "." + str(__name__))
+
+
+def load_plugins(modules: list = Config.EXCHANGE_PLUGINS):
+    # modules defining more Exchange subclasses
+    for module in modules:
+        importlib.import_module(module)
+
+
+load_plugins()
+
+
+def parse_pair(pair: str) -> tuple:
+    base, quote = pair.split("_")
+    return (base, quote)
+
+
+def _default_feeds() -> dict:
+    tickers = [base + "_" + quote for base, quote in Config.pairs_TICKERS]
+    candles = [base + "_" + quote for base, quote in Config.pairs_CANDLES]
+    return {'exchanges': {'poloniex': {'channels': ["ticker"], 'pairs': tickers},
+                          'gemini': {'channels': ["candles_5m"], 'pairs': candles},
+                          'bittrex': {'channels': ["ticker"], 'pairs': tickers}},
+            'sinks': list(SINKS)}
+
+
+def feeds_path() -> str:
+    return os.environ.get(ENV_PREFIX + "FEEDS_FILE", Config.FEEDS_FILE)
+
+
+def load_feeds(path: str = None) -> dict:
+    path = path or feeds_path()
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            feeds = json.load(file)
+    else:
+        feeds = _default_feeds()
+    exchanges = feeds.get('exchanges', {})
+    enabled = os.environ.get(ENV_PREFIX + "EXCHANGES")
+    if enabled:
+        exchanges = {name: options for name, options in exchanges.items() if name in enabled.split(",")}
+    for name, options in exchanges.items():
+        pairs = os.environ.get(ENV_PREFIX + name.upper() + "_PAIRS")
+        if pairs is not None:
+            options['pairs'] = [pair for pair in pairs.split(",") if pair]
+    sinks = os.environ.get(ENV_PREFIX + "SINKS")
+    feeds = {'exchanges': exchanges,
+             'sinks': sinks.split(",") if sinks else feeds.get('sinks', list(SINKS))}
+    _validate(feeds)
+    return feeds
+
+
+def _validate(feeds: dict):
+    for name, options in feeds['exchanges'].items():
+        if name not in EXCHANGES:
+            raise ValueError(f"Unknown exchange {name}, registered: {sorted(EXCHANGES)}")
+        for channel in options.get('channels', []):
+            if channel not in EXCHANGES[name].channels:
+                raise ValueError(f"Unknown {name} channel {channel}, expected one of {EXCHANGES[name].channels}")
+        for pair in options.get('pairs', []):
+            parse_pair(pair)
+    for sink in feeds['sinks']:
+        if sink not in SINKS:
+            raise ValueError(f"Unknown sink {sink}, expected one of {SINKS}")
+
+
+def create_exchange(name: str, sinks: list, feeds: dict = None):
+    options = (feeds or load_feeds())['exchanges'][name]
+    return EXCHANGES[name](sinks, [parse_pair(pair) for pair in options.get('pairs', [])],
+                           channels=options.get('channels'))
+
+
+class FeedWatcher:
+    '''
+    reloads the feed config when the file changes and applies pair changes
+    to the running exchanges, their websockets stay connected.
+    Adding or removing an exchange or a sink needs a restart.
+    '''
+
+    def __init__(self, exchanges: list, interval: float = Config.feeds_RELOAD_INTERVAL, started: set = None):
+        self.exchanges = exchanges
+        # exchanges started by this process or, in a shard, by any shard
+        self.started = started if started is not None else {exchange.name for exchange in exchanges}
+        self.interval = interval
+        self.path = feeds_path()
+        self.mtime = self.__mtime()
+
+    def __mtime(self) -> float:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    async def reload(self):
+        feeds = load_feeds(self.path)
+        for name in set(feeds['exchanges']) - self.started:
+            logger.warning(f"Exchange {name} added to {self.path}, it starts after a restart")
+        for exchange in self.exchanges:
+            options = feeds['exchanges'].get(exchange.name)
+            if options is None:
+                logger.warning(f"Exchange {exchange.name} removed from {self.path}, it stops after a restart")
+                continue
+            await exchange.set_pairs([parse_pair(pair) for pair in options.get('pairs', [])])
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            mtime = self.__mtime()
+            if mtime == self.mtime:
+                continue
+            self.mtime = mtime
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"Error reloading {self.path}, keeping the current pairs:{e}->{traceback.format_exc()}")
@@ -1,104 +1,150 @@
 import logging
-import asyncio
 import websockets
-import json
+import codec
 import traceback
-import sys
-import time
-from collections import defaultdict
-from pymongo import MongoClient
-from mongodb import MongoDataBase
-from mysqldb import MysqlDataBase
-from datetime import datetime
+from records import Candle
+from symbols import SymbolRegistry
 
 from config import Config
 from exchange import Exchange
 
+# candle channels and their length in seconds
+CANDLE_FRAMES = {"candles_1m": 60, "candles_5m": 300, "candles_15m": 900, "candles_30m": 1800,
+                 "candles_1h": 3600, "candles_6h": 21600, "candles_1d": 86400}
+
+
 class Gemini(Exchange):
 
-    def __init__(self, mongodb: MongoDataBase, mysqldb: MysqlDataBase, pairs_to_record: list):
+    name = "gemini"
+    channels = ("candles_5m",) + tuple(channel for channel in CANDLE_FRAMES if channel != "candles_5m")
+
+    def __init__(self, sinks: list, pairs_to_record: list, channels: list = None):
+
+        super().__init__(sinks)
 
         self.logger = logging.getLogger(
             Config.LOGGING_NAME + "." + str(__name__))
         self.logger.debug(f"Init {str(__name__)}")
-        
-        self.mongodb = mongodb
-        self.mysqldb = mysqldb
-        self.logger.debug(f"mongodb id:{id(self.mongodb)}")
-        self.logger.debug(f"mysqldb id:{id(self.mysqldb)}")
+        self.logger.debug(f"sinks:{[sink.name for sink in self.sinks]}")
+
+        self.symbols = SymbolRegistry()
+        self.pairs = list(pairs_to_record)
+        self.pairs_to_record = [self.symbols.instrument(self.name, base, quote).symbol for base, quote in self.pairs]
+        self.candles_types = list(channels) if channels else [self.channels[0]]
+        # update message type -> frame in seconds, one per subscribed channel
+        self.update_frames = {channel + "_updates": CANDLE_FRAMES[channel] for channel in self.candles_types}
+        self.ws_uri = Config.gemini_WS_URI
+        # (pair, frame) -> bar still forming, written once a newer bar starts
+        self.forming = {}
 
-        self.pairs_to_record = [quote + base for base,quote in pairs_to_record]
-        self.candles_type = "candles_5m"
-        self.candles_type_seconds = 300
+    def subscribe_message(self, symbols: list = None, type: str = "subscribe") -> dict:
+        symbols = self.pairs_to_record if symbols is None else symbols
+        return {"type": type,"subscriptions":[{"name":channel,"symbols":symbols} for channel in self.candles_types]}
 
+    async def update_pairs(self, added: list, removed: list):
+        self.pairs_to_record = [self.symbols.instrument(self.name, base, quote).symbol for base, quote in self.pairs]
+        websocket = self.websocket
+        if websocket is None:
+            return
+        try:
+            if added:
+                symbols = [self.symbols.instrument(self.name, base, quote).symbol for base, quote in added]
+                await websocket.send(codec.dumps(self.subscribe_message(symbols)))
+            if removed:
+                symbols = [self.symbols.instrument(self.name, base, quote).symbol for base, quote in removed]
+                await websocket.send(codec.dumps(self.subscribe_message(symbols, "unsubscribe")))
+        except websockets.exceptions.ConnectionClosed:
+            # the next connection subscribes self.pairs_to_record
+            pass
 
-    def __parse_candle_response(self, response: dict) -> dict:
 
+    def __parse_candle_response(self, response: dict) -> list:
+        '''
+        the first message is a snapshot of past bars, the next ones update the
+        forming bar, every entry of changes is a candle
+        '''
         if type(response) == dict and all( (key in response for key in ['type',"symbol","changes"]) ):
-            if response['type'] == self.candles_type + "_updates":
+            frame = self.update_frames.get(response['type'])
+            if frame is not None:
                 if response['symbol'] in self.pairs_to_record:
-                    changes = list(response['changes'])
-                    return self.__parse_candle(response['symbol'],changes[0])
-        else:
-            return None
-    def __parse_candle(self,pair: str, candle: list) -> dict:
+                    pair = self.symbols.by_symbol(self.name, response['symbol']).pair
+                    candles = (self.__parse_candle(pair, frame, change) for change in response['changes'])
+                    return [candle for candle in candles if candle is not None]
+        return []
+
+    def __coalesce(self, candles: list) -> list:
+        '''
+        keeps only the last state of the forming bar of each pair and frame,
+        returns the bars that are final
+        '''
+        final = []
+        for candle in sorted(candles, key=lambda candle: candle.epoch):
+            forming = self.forming.get((candle.pair, candle.frame))
+            if forming is None or candle.epoch >= forming.epoch:
+                if forming is not None and candle.epoch > forming.epoch:
+                    final.append(forming)
+                self.forming[(candle.pair, candle.frame)] = candle
+            else:
+                # a past bar from the snapshot, stored as it is
+                final.append(candle)
+        return final
+
+    def __parse_candle(self,pair: str, frame: int, candle: list) -> Candle:
         if type(candle) == list and len(candle) == 6:
-            new_candle = {}
-            new_candle['source'] = "gemini"
-            #new_candle['frame'] = self.candles_type.split("_")[1]
-            new_candle['frame'] = int(self.candles_type_seconds)
-            new_candle['epoch'] = int(candle[0]/1000) #in seconds
-            new_candle['ts'] = datetime.utcfromtimestamp(new_candle['epoch']).strftime('%Y-%m-%d %H:%M:%S')
-            new_candle['pair'] = str(pair)
-            new_candle['open'] = float(candle[1])
-            new_candle['high'] = float(candle[2])
-            new_candle['low'] = float(candle[3])
-            new_candle['close'] = float(candle[4])
-            new_candle['volume'] = float(candle[5])
-            return new_candle
+            return Candle(source=self.name,
+                          pair=str(pair),
+                          frame=frame,
+                          epoch=int(candle[0]/1000), #in seconds
+                          open=float(candle[1]),
+                          high=float(candle[2]),
+                          low=float(candle[3]),
+                          close=float(candle[4]),
+                          volume=float(candle[5]))
         else:
             return None
     
-    async def get_tickers(self,lock):
-        ws_uri = "wss://api.gemini.com/v2/marketdata"
-        while True:
-            try:
-                self.logger.debug("Starting connection with Gemini")
-                async with websockets.connect(ws_uri) as websocket:
-                    data = {"type": "subscribe","subscriptions":[{"name":self.candles_type,"symbols":self.pairs_to_record}]}
-                    await websocket.send(json.dumps(data))
-                    while True:
-                        try:
-                            r = await websocket.recv()
-                        except websockets.exceptions.ConnectionClosed as e:
-                            self.logger.error(
-                                f"websockets.exceptions.ConnectionClosed:{e}>{traceback.format_exc()}")
-                            break
-                        except Exception as e:
-                            self.logger.error(
-                                f"Exception:{e}->{traceback.format_exc()}")
-                            break
-                        else:
-                            response = json.loads(r)
-                            #self.logger.debug(f"Gemini:{response}")
-                            candle = self.__parse_candle_response(response)
-                            if candle is not None:
-                                self.logger.debug(f"Gemini candle:{candle}")
-                                try:
-                                    async with lock:
-                                        self.mongodb.insert("candles",candle)
-                                except Exception as e:
-                                    self.logger.error(f"Exception in Insert MongoDataBase:{e}->{traceback.format_exc()}")
-                                    return
-                                try:
-                                    async with lock:
-                                        self.mysqldb.insert("candles",candle)
-                                except Exception as e:
-                                    self.logger.error(f"Exception in Insert MysqlDataBase:{e}->{traceback.format_exc()}")
-                                    return
-            except Exception as e:
-                self.logger.error(f"Exception:{e}->{traceback.format_exc()}")
-
+    async def get_tickers(self):
+        # a single connection, the Supervisor reconnects with its backoff when it ends or fails
+        try:
+            self.logger.debug("Starting connection with Gemini")
+            async with websockets.connect(self.ws_uri) as websocket:
+                await websocket.send(codec.dumps(self.subscribe_message()))
+                self.websocket = websocket
+                while True:
+                    timer = self.profiler.timer(self.name)
+                    try:
+                        r = await websocket.recv()
+                    except websockets.exceptions.ConnectionClosed as e:
+                        self.logger.error(
+                            f"websockets.exceptions.ConnectionClosed:{e}>{traceback.format_exc()}")
+                        break
+                    if timer:
+                        timer.mark("recv")
+                    self.metrics.messages_received.inc(exchange=self.name)
+                    self.health.message(self.name)
+                    response = codec.loads(r)
+                    if timer:
+                        timer.mark("json.loads")
+                    #self.logger.debug(f"Gemini:{response}")
+                    candles = self.__parse_candle_response(response)
+                    if timer:
+                        timer.mark("parse")
+                    for candle in candles:
+                        self.metrics.messages_parsed.inc(exchange=self.name, pair=candle.pair)
+                    for candle in self.__coalesce(candles):
+                        self.logger.debug(f"Gemini candle:{candle}")
+                        await self.insert("candles",candle)
+                    if timer:
+                        timer.mark("enqueue")
+        finally:
+            self.websocket = None
+            self.metrics.reconnects.inc(exchange=self.name)
             self.logger.info("Connection lost with Gemini")
-            await asyncio.sleep(5)
+
+    async def close(self):
+        # the forming bars are written as they are, the upsert completes them after a restart
+        forming, self.forming = self.forming, {}
+        for candle in forming.values():
+            await self.insert("candles", candle)
+        await super().close()
 
@@ -0,0 +1,75 @@
+import time
+
+from config import Config
+from records import Ticker
+from singleton import Singleton
+
+
+class Health(metaclass=Singleton):
+    '''
+    Tracks pipeline freshness: last message per exchange, last successful
+    write per sink and ingest latency. report() marks as stale anything
+    older than the Config.health_* thresholds.
+    '''
+
+    def __init__(self):
+        self.started = time.time()
+        self.last_message = {}
+        self.exchange_latency = {}
+        self.last_insert = {}
+        self.ingest_latency = {}
+        self.last_error = {}
+
+    def register_exchange(self, exchange: str):
+        self.last_message.setdefault(exchange, None)
+
+    def register_sink(self, sink: str):
+        self.last_insert.setdefault(sink, None)
+
+    def message(self, exchange: str, exchange_epoch: float = None):
+        now = time.time()
+        self.last_message[exchange] = now
+        if exchange_epoch is not None:
+            self.exchange_latency[exchange] = now - exchange_epoch
+
+    def exchanges(self) -> dict:
+        return {'last_message': dict(self.last_message), 'exchange_latency': dict(self.exchange_latency)}
+
+    def merge_exchanges(self, exchanges: dict):
+        # freshness reported by a worker process
+        self.last_message.update(exchanges['last_message'])
+        self.exchange_latency.update(exchanges['exchange_latency'])
+
+    def inserted(self, sink: str, records: list):
+        now = time.time()
+        self.last_insert[sink] = now
+        # tickers are stamped on arrival, candles carry the bar open time
+        epochs = [record.epoch for record in records if isinstance(record, Ticker)]
+        if epochs:
+            self.ingest_latency[sink] = now - min(epochs)
+
+    def error(self, sink: str, error: Exception):
+        self.last_error[sink] = {'epoch': int(time.time()), 'error': repr(error)}
+
+    def __age(self, now: float, last: float) -> float:
+        # never seen counts from start up
+        return now - (last if last is not None else self.started)
+
+    def report(self) -> dict:
+        now = time.time()
+        healthy = True
+        exchanges = {}
+        for exchange, last in self.last_message.items():
+            age = self.__age(now, last)
+            latency = self.exchange_latency.get(exchange)
+            stale = age > Config.health_MAX_MESSAGE_AGE or (latency is not None and latency > Config.health_MAX_LATENCY)
+            healthy = healthy and not stale
+            exchanges[exchange] = {'last_message_age': round(age, 3), 'latency': latency, 'stale': stale}
+        sinks = {}
+        for sink, last in self.last_insert.items():
+            age = self.__age(now, last)
+            stale = age > Config.health_MAX_INSERT_AGE
+            healthy = healthy and not stale
+            sinks[sink] = {'last_insert_age': round(age, 3), 'ingest_latency': self.ingest_latency.get(sink),
+                           'last_error': self.last_error.get(sink), 'stale': stale}
+        return {'healthy': healthy, 'epoch': int(now), 'exchanges': exchanges, 'sinks': sinks}
@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codec
+
+'''
+Decode speed of every installed JSON codec on frames recorded with record_frames.py
+
+python helpers/bench_codec.py frames/poloniex.jsonl
+'''
+
+
+def bench(frames: list, loads, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for frame in frames:
+            loads(frame)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"usage: {sys.argv[0]} frames.jsonl [rounds]")
+        sys.exit(1)
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with open(sys.argv[1]) as file:
+        frames = [json.loads(line)[1] for line in file if line.strip()]
+    total = len(frames) * rounds
+    results = {}
+    for name in codec.PREFERENCE:
+        try:
+            loads, _dumps = codec.build(name)
+        except ImportError:
+            print(f"{name:8} not installed")
+            continue
+        results[name] = bench(frames, loads, rounds)
+    for name, seconds in results.items():
+        print(f"{name:8} {total / seconds:12.0f} frames/s {seconds * 1e6 / total:8.2f} us/frame "
+              f"{results['json'] / seconds:5.1f}x json")
+    print(f"selected codec: {codec.NAME}")
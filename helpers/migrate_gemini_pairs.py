@@ -0,0 +1,68 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feeds import load_feeds, parse_pair
+from records import Candle
+from symbols import SYMBOL_FORMATS, pair_name
+
+'''
+Rename the Gemini candles stored under the exchange symbol (BTCUSD) to the
+normalized pair (USD_BTC) used since the symbol registry, for every Gemini
+pair of the feeds file and every configured sink.
+Bars already stored under both names keep the merged bar (Candle.merge).
+
+python helpers/migrate_gemini_pairs.py
+'''
+
+BATCH_SIZE = 1000
+
+
+def renames(feeds: dict) -> list:
+    pairs = feeds['exchanges'].get("gemini", {}).get('pairs', [])
+    return [(SYMBOL_FORMATS["gemini"].format(base=base, quote=quote), pair_name(base, quote))
+            for base, quote in (parse_pair(pair) for pair in pairs)]
+
+
+def migrate_mongodb(renames: list):
+    from mongodb import MongoDataBase
+    database = MongoDataBase()
+    database.connect()
+    collection = database.db["candles"]
+    for old, new in renames:
+        moved = 0
+        while True:
+            documents = list(collection.find({'source': "gemini", 'pair': old}).limit(BATCH_SIZE))
+            if not documents:
+                break
+            candles = [Candle(**{field: document[field] for field in Candle._fields})._replace(pair=new)
+                       for document in documents]
+            database.insert_many("candles", candles)
+            collection.delete_many({'_id': {'$in': [document['_id'] for document in documents]}})
+            moved += len(documents)
+        print(f"mongodb: {old} -> {new}, {moved} candles")
+    database.close()
+
+
+def migrate_mysqldb(renames: list):
+    from mysqldb import MysqlDataBase
+    database = MysqlDataBase()
+    database.connect()
+    with database.connection.cursor() as cursor:
+        for old, new in renames:
+            moved = cursor.execute("update ignore `candles` set `pair`=%s where `source`='gemini' and `pair`=%s",
+                                   (new, old))
+            # bars stored under both names, the new one was written by the running feed
+            duplicates = cursor.execute("delete from `candles` where `source`='gemini' and `pair`=%s", (old,))
+            print(f"mysqldb: {old} -> {new}, {moved} candles, {duplicates} duplicates dropped")
+    database.connection.commit()
+    database.close()
+
+
+if __name__ == "__main__":
+    feeds = load_feeds()
+    if "mongodb" in feeds['sinks']:
+        migrate_mongodb(renames(feeds))
+    if "mysqldb" in feeds['sinks']:
+        migrate_mysqldb(renames(feeds))
@@ -0,0 +1,48 @@
+import asyncio
+import base64
+import json
+import random
+import sys
+import zlib
+
+import websockets
+
+'''
+Local stand-in for the Bittrex v3 socket, pushes compressed ticker updates
+for every subscribed ticker_ channel.
+
+python helpers/mock_bittrex_socket.py 8765
+and in config.py:
+bittrex_SOCKET_URL = "ws://localhost:8765"
+bittrex_SOCKET_NEGOTIATE = False
+'''
+
+
+def encode(payload: dict) -> str:
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    data = compressor.compress(json.dumps(payload).encode()) + compressor.flush()
+    return base64.b64encode(data).decode()
+
+
+async def handler(websocket, path):
+    subscribe = json.loads(await websocket.recv())
+    channels = subscribe["A"][0]
+    await websocket.send(json.dumps({"R": [{"Success": True, "ErrorCode": None} for _ in channels], "I": str(subscribe["I"])}))
+    symbols = [channel[len("ticker_"):] for channel in channels if channel.startswith("ticker_")]
+    price = 100.0
+    while True:
+        messages = []
+        for symbol in symbols:
+            price *= 1 + random.uniform(-0.001, 0.001)
+            ticker = {"symbol": symbol, "lastTradeRate": f"{price:.8f}",
+                      "bidRate": f"{price * 0.999:.8f}", "askRate": f"{price * 1.001:.8f}"}
+            messages.append({"H": "C3", "M": "ticker", "A": [encode(ticker)]})
+        messages.append({"H": "C3", "M": "heartbeat", "A": []})
+        await websocket.send(json.dumps({"C": "mock", "M": messages}))
+        await asyncio.sleep(1)
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    asyncio.get_event_loop().run_until_complete(websockets.serve(handler, "localhost", port))
+    asyncio.get_event_loop().run_forever()
@@ -0,0 +1,51 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poloniex import Poloniex
+from gemini import Gemini
+
+'''
+Record raw websocket frames to a jsonl file, one [seconds_since_start, frame] per line.
+
+python helpers/record_frames.py poloniex frames/poloniex.jsonl 600
+python helpers/record_frames.py gemini frames/gemini.jsonl 600
+'''
+
+PAIRS = {
+    "poloniex": (Poloniex, [("USDT", "BTC"), ("USDT", "ETH")]),
+    "gemini": (Gemini, [("USD", "BTC"), ("USD", "ETH")]),
+}
+
+
+async def record(exchange_name: str, filename: str, seconds: float):
+    exchange_class, pairs = PAIRS[exchange_name]
+    exchange = exchange_class([], pairs)
+    frames = 0
+    async with websockets.connect(exchange.ws_uri) as websocket:
+        await websocket.send(json.dumps(exchange.subscribe_message()))
+        start = time.perf_counter()
+        with open(filename, "w") as file:
+            while time.perf_counter() - start < seconds:
+                try:
+                    frame = await asyncio.wait_for(websocket.recv(), seconds)
+                except asyncio.TimeoutError:
+                    break
+                file.write(json.dumps([round(time.perf_counter() - start, 6), frame]) + "\n")
+                frames += 1
+    print(f"recorded {frames} frames from {exchange_name} in {filename}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(f"usage: {sys.argv[0]} poloniex|gemini output.jsonl [seconds]")
+        sys.exit(1)
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 60
+    os.makedirs(os.path.dirname(os.path.abspath(sys.argv[2])), exist_ok=True)
+    asyncio.get_event_loop().run_until_complete(record(sys.argv[1], sys.argv[2], seconds))
@@ -0,0 +1,25 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from symbols import SymbolRegistry
+
+'''
+Refresh the symbol snapshot (json/symbols.json) from the exchange REST APIs.
+
+python helpers/refresh_symbols.py
+python helpers/refresh_symbols.py poloniex
+'''
+
+
+async def main(exchanges: list):
+    registry = SymbolRegistry()
+    await registry.refresh(exchanges)
+    for exchange, symbols in sorted(registry.symbols.items()):
+        print(f"{exchange}: {len(symbols)} symbols")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:] or ["poloniex", "bittrex"]))
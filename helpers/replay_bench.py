@@ -0,0 +1,146 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from metrics import Metrics
+from memorydb import MemoryDataBase
+from sink import DataBaseSink
+from poloniex import Poloniex
+from gemini import Gemini
+
+'''
+Replay frames captured with record_frames.py through a local mock websocket
+server into an exchange class backed by in-memory sinks.
+
+python helpers/replay_bench.py poloniex frames/poloniex.jsonl --rate 10
+--rate 1 replays in real time, 10 ten times faster, 0 flat-out.
+'''
+
+EXCHANGES = {
+    "poloniex": (Poloniex, [("USDT", "BTC"), ("USDT", "ETH")]),
+    "gemini": (Gemini, [("USD", "BTC"), ("USD", "ETH")]),
+}
+
+
+class ReplayServer:
+
+    def __init__(self, frames: list, rate: float):
+        self.frames = frames
+        self.rate = rate
+        self.sent = 0
+        self.served = False
+        self.done = asyncio.Event()
+
+    async def handler(self, websocket, path):
+        await websocket.recv()  # subscription
+        if self.served:
+            # a reconnect would replay everything twice
+            await websocket.wait_closed()
+            return
+        self.served = True
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for offset, frame in self.frames:
+            if self.rate > 0:
+                delay = start + offset / self.rate - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await websocket.send(frame)
+            self.sent += 1
+        self.done.set()
+        await websocket.wait_closed()
+
+
+def load_frames(filename: str) -> list:
+    with open(filename) as file:
+        return [tuple(json.loads(line)) for line in file if line.strip()]
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def bench(exchange_name: str, filename: str, rate: float, port: int) -> dict:
+    frames = load_frames(filename)
+    server = ReplayServer(frames, rate)
+    ws_server = await websockets.serve(server.handler, "localhost", port)
+
+    databases = [MemoryDataBase(), MemoryDataBase()]
+    sinks = [DataBaseSink("memory" + str(i), database, batch_size=Config.mysql_BATCH_SIZE,
+                         flush_interval=Config.mysql_FLUSH_INTERVAL)
+             for i, database in enumerate(databases)]
+    for sink in sinks:
+        await sink.connect()
+        sink.start()
+
+    exchange_class, pairs = EXCHANGES[exchange_name]
+    exchange = exchange_class(sinks, pairs)
+    exchange.ws_uri = f"ws://localhost:{port}"
+    # store every accepted record so the sinks see the full load
+    exchange.conflator = None
+    exchange.candle_builder = None
+    insert = exchange.insert
+
+    async def stamped_insert(collection: str, record):
+        # latency covers the feed queue, its dispatcher and the sink writers
+        enqueued = time.perf_counter()
+        for database in databases:
+            database.enqueued[id(record)] = enqueued
+        await insert(collection, record)
+    exchange.insert = stamped_insert
+
+    received = Metrics().messages_received
+    start = time.perf_counter()
+    task = asyncio.create_task(exchange.get_tickers())
+    await server.done.wait()
+    while received.values.get((exchange.name,), 0) < server.sent:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    await exchange.queue.close()
+    for sink in sinks:
+        await sink.queue.join()
+    drained = time.perf_counter() - start
+
+    task.cancel()
+    ws_server.close()
+    await ws_server.wait_closed()
+    for sink in sinks:
+        await sink.close()
+
+    latencies = databases[0].latencies
+    return {
+        'exchange': exchange_name,
+        'frames': server.sent,
+        'rate': rate,
+        'seconds': round(elapsed, 3),
+        'msgs_per_sec': round(server.sent / elapsed, 1) if elapsed else None,
+        'inserted': dict(databases[0].counts),
+        'drain_seconds': round(drained, 3),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        # kilobytes on linux
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="replay recorded frames through an exchange class")
+    parser.add_argument("exchange", choices=sorted(EXCHANGES))
+    parser.add_argument("frames")
+    parser.add_argument("--rate", type=float, default=0, help="1 real time, 10 ten times faster, 0 flat-out")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    report = asyncio.get_event_loop().run_until_complete(bench(args.exchange, args.frames, args.rate, args.port))
+    print(json.dumps(report, indent=4))
@@ -5,16 +5,27 @@ import json
 import time
 import concurrent.futures
 import traceback
-from poloniex import Poloniex
-from gemini import Gemini
-from bittrex import Bittrex
+import functools
+from feeds import load_feeds, create_exchange, FeedWatcher
 import logging
 from logging.handlers import TimedRotatingFileHandler
 from config import Config
 import os
+import signal
 import sys
 from mongodb import MongoDataBase
 from mysqldb import MysqlDataBase
+from sink import DataBaseSink
+from spool import Spool
+from supervisor import Supervisor
+from metrics import Metrics
+from monitor import LoopLagMonitor
+from health import Health
+from profiler import Profiler
+from sharding import ShardManager
+from arbitration import Arbiter
+from partitions import PartitionManager
+from symbols import SymbolRegistry
 from aiohttp import web
 
 
@@ -62,72 +73,181 @@ def configure_logging(name):
 async def state(request):
     logger.debug("Running:" + str(request))
     res = {'state': 1, 'epoch': int(time.time())}
+    for exchange in request.app['exchanges']:
+        if hasattr(exchange, 'stats'):
+            res[type(exchange).__name__.lower()] = exchange.stats()
+    res['conflation'] = {exchange.name: exchange.conflator.stats()
+                         for exchange in request.app['exchanges'] if exchange.conflator is not None}
+    res['candles'] = {exchange.name: exchange.candle_builder.stats()
+                      for exchange in request.app['exchanges'] if exchange.candle_builder is not None}
+    res['feeds'] = request.app['supervisor'].stats()
+    res['arbitration'] = request.app['arbiter'].stats()
+    if request.app['shards'] is not None:
+        res['shards'] = request.app['shards'].stats()
     return web.json_response(res)
 
 
+async def health(request):
+    res = Health().report()
+    return web.json_response(res, status=200 if res['healthy'] else 503)
 
-async def main():
 
-    while True:
+async def profile(request):
+    return web.json_response({'loop_lag': request.app['lag_monitor'].lag, 'stages': Profiler().report()})
 
-        logger.info("Start Main")
-        time.sleep(5)
-        lock = asyncio.Lock()
 
-        mongodb = MongoDataBase(Config.ticker_PRIORITY_EXCHANGE)
-        mysqldb = MysqlDataBase(Config.ticker_PRIORITY_EXCHANGE)
+async def storage(request):
+    mongodb = request.app['mongodb']
+    if mongodb is None:
+        return web.json_response({})
+    return web.json_response({mongodb.name: await mongodb.call(mongodb.database.storage)})
 
-        app = web.Application()
-        app.add_routes([web.get('/', state)])
 
-        runner = web.AppRunner(app)
-        await runner.setup()
-        site = web.TCPSite(runner, '0.0.0.0', 8080)
-        await site.start()
-       
+async def metrics(request):
+    return web.Response(text=Metrics().render(), content_type="text/plain")
 
-        try:
-            mongodb.connect()
-        except:
-            logger.error("Error connecting to Mongo Data Base")
-            await asyncio.sleep(5)
-            continue
 
+async def connect(sink: DataBaseSink):
+    delay = Config.supervisor_BASE_DELAY
+    while True:
         try:
-            mysqldb.connect()
-        except:
-            logger.error("Error connecting to Mysql Data Base")
-            await asyncio.sleep(5)
-            continue
-
-
-        pairs_to_record_tickers = [("USDT","BTC"),("USDT","ETH")]
-        pairs_to_record_candles = [("USD","BTC"),("USD","ETH")]
-        poloniex = Poloniex(mongodb,mysqldb,pairs_to_record_tickers)
-        gemini = Gemini(mongodb,mysqldb,pairs_to_record_candles)
-        bittrex = Bittrex(mongodb,mysqldb,pairs_to_record_tickers)
-        poloniex_task_tickers = asyncio.create_task(poloniex.get_tickers(lock))
-        gemini_task_tickers = asyncio.create_task(gemini.get_tickers(lock))
-        bittrex_task_tickers = asyncio.create_task(bittrex.get_tickers(lock))
-        
-        _done, pending = await asyncio.wait([poloniex_task_tickers, gemini_task_tickers,bittrex_task_tickers],return_when=asyncio.FIRST_COMPLETED)
-        for task in pending:
-            task.cancel()
+            await sink.connect()
+        except Exception as e:
+            logger.error(f"Error connecting to {sink.name}: {e}, retry in {delay}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, Config.supervisor_MAX_DELAY)
+        else:
+            return
 
-        await runner.cleanup()
 
+async def maintain_partitions(sink: DataBaseSink, partitions: PartitionManager):
+    await sink.connected.wait()
+    while True:
         try:
-            mysqldb.close()
+            await sink.call(partitions.maintain)
         except Exception as e:
-            logger.error(f"Error closing connecting to Mysql Data Base: {e}")
+            logger.error(f"Error maintaining {sink.name} partitions: {e}")
+        await asyncio.sleep(Config.mysql_PARTITION_CHECK_INTERVAL)
 
-        try:
-            mongodb.close()
-        except Exception as e:
-            logger.error(f"Error closing connecting to Mongo Data Base: {e} ")
+
+async def main():
+
+    logger.info("Start Main")
+
+    # docker stop sends SIGTERM to PID 1, cancelling the main task runs the teardown in finally
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, asyncio.current_task().cancel)
+
+    feeds = load_feeds()
+    logger.info(f"Feeds:{feeds}")
+    mongodb = None
+    mysqldb = None
+    if "mongodb" in feeds['sinks']:
+        mongodb = DataBaseSink("mongodb", MongoDataBase(),
+                               batch_size=Config.mongo_BATCH_SIZE,
+                               flush_interval=Config.mongo_FLUSH_INTERVAL,
+                               spool=Spool("mongodb") if Config.spool_ENABLED else None)
+    if "mysqldb" in feeds['sinks']:
+        mysqldb = DataBaseSink("mysqldb", MysqlDataBase(),
+                               batch_size=Config.mysql_BATCH_SIZE,
+                               flush_interval=Config.mysql_FLUSH_INTERVAL,
+                               spool=Spool("mysqldb") if Config.spool_ENABLED else None)
+    sinks = [sink for sink in (mongodb, mysqldb) if sink is not None]
+    # every feed writes through the arbiter, one consolidated ticker stream
+    arbiter = Arbiter(sinks)
+    supervisor = Supervisor()
+    lag_monitor = LoopLagMonitor()
+    lag_monitor_task = asyncio.create_task(lag_monitor.run())
+    profiler_task = asyncio.create_task(Profiler().run())
+
+    def collect():
+        for sink in sinks:
+            Metrics().queue_depth.set(sink.queue.qsize(), queue=sink.name)
+            if sink.spool is not None:
+                Metrics().spool_bytes.set(sink.spool_size, backend=sink.name)
+        for exchange in app['exchanges']:
+            Metrics().queue_depth.set(exchange.queue.qsize(), queue=exchange.name)
+        for feed, stats in supervisor.stats().items():
+            Metrics().feed_restarts.set(stats['restarts'], feed=feed)
+    Metrics().add_collector(collect)
+
+    app = web.Application()
+    app['exchanges'] = []
+    app['supervisor'] = supervisor
+    app['lag_monitor'] = lag_monitor
+    app['shards'] = None
+    app['arbiter'] = arbiter
+    app['mongodb'] = mongodb
+    app.add_routes([web.get('/', state), web.get('/metrics', metrics), web.get('/health', health), web.get('/profile', profile), web.get('/storage', storage)])
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '0.0.0.0', 8080)
+    await site.start()
+
+    shards = None
+    reader_task = None
+    partitions_task = None
+    symbols_task = None
+    watcher_task = None
+    connect_tasks = []
+    try:
+        # feeds start right away, sinks spool until their database connects
+        for sink in sinks:
+            sink.start()
+            connect_tasks.append(asyncio.create_task(connect(sink)))
+        if mysqldb is not None:
+            partitions_task = asyncio.create_task(maintain_partitions(mysqldb, PartitionManager(mysqldb.database)))
+        # shard workers refresh their own registry
+        await SymbolRegistry().ensure()
+        if Config.symbols_REFRESH_INTERVAL and not Config.PROCESS_SHARDS:
+            symbols_task = asyncio.create_task(SymbolRegistry().run())
+
+        if Config.PROCESS_SHARDS:
+            shards = ShardManager(Config.PROCESS_SHARDS, [arbiter])
+            app['shards'] = shards
+            reader_task = asyncio.create_task(shards.run_reader())
+            for shard in range(len(Config.PROCESS_SHARDS)):
+                supervisor.add(f"shard{shard}", functools.partial(shards.run_worker, shard))
+        else:
+            for name in feeds['exchanges']:
+                exchange = create_exchange(name, [arbiter], feeds)
+                app['exchanges'].append(exchange)
+                supervisor.add(name, exchange.get_tickers)
+            # pair changes in the feeds file are applied without reconnecting
+            watcher_task = asyncio.create_task(FeedWatcher(app['exchanges']).run())
+
+        supervisor.start()
+        await supervisor.wait()
+    finally:
+        # pending sink buffers get flushed on shutdown
+        await supervisor.stop()
+        if shards is not None:
+            # the reader forwards the last records of the workers while they stop
+            await shards.close()
+            reader_task.cancel()
+        for exchange in app['exchanges']:
+            await exchange.close()
+        for task in connect_tasks:
+            task.cancel()
+        lag_monitor_task.cancel()
+        profiler_task.cancel()
+        if partitions_task is not None:
+            partitions_task.cancel()
+        if symbols_task is not None:
+            symbols_task.cancel()
+        if watcher_task is not None:
+            watcher_task.cancel()
+        await runner.cleanup()
+
+        for sink in sinks:
+            try:
+                await sink.close()
+            except Exception as e:
+                logger.error(f"Error closing connection to {sink.name}: {e}")
 
         logger.info("End Main")
-        time.sleep(5)
 
 
 if __name__ == "__main__":
@@ -137,5 +257,8 @@ if __name__ == "__main__":
     logger = configure_logging(Config.LOGGING_NAME)
     logger.info("Configure logging OK")
  
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    except asyncio.CancelledError:
+        logger.info("Stopped by signal")
   
@@ -0,0 +1,43 @@
+import logging
+import time
+from collections import defaultdict
+
+from config import Config
+
+
+class MemoryDataBase:
+    '''
+    In-memory stand-in for MongoDataBase / MysqlDataBase, used by the replay
+    benchmark. Keeps counts per collection, the last records and the latency
+    from Exchange.insert to the insert of records registered in enqueued
+    (id -> perf_counter).
+    '''
+
+    def __init__(self, keep_last: int = 1000):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.keep_last = keep_last
+        self.counts = defaultdict(int)
+        self.records = defaultdict(list)
+        self.latencies = []
+        self.enqueued = {}
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def insert(self, collection: str, record: dict):
+        self.insert_many(collection, [record])
+
+    def insert_many(self, collection: str, records: list):
+        now = time.perf_counter()
+        for record in records:
+            enqueued = self.enqueued.pop(id(record), None)
+            if enqueued is not None:
+                self.latencies.append(now - enqueued)
+        self.counts[collection] += len(records)
+        kept = self.records[collection]
+        kept.extend(records)
+        del kept[:-self.keep_last]
@@ -0,0 +1,173 @@
+import bisect
+import threading
+
+from singleton import Singleton
+
+
+class Metric:
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+    def format_labels(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{label}="{value}"' for label, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> list:
+        with self.lock:
+            return [f"{self.name}{self.format_labels(key)} {value}" for key, value in self.values.items()]
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return lines + self.samples()
+
+
+class Counter(Metric):
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+
+class Histogram(Metric):
+
+    kind = "histogram"
+    default_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = default_buckets):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self) -> list:
+        lines = []
+        with self.lock:
+            for key, (counts, total) in self.values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    bucket = 'le="' + str(bound) + '"'
+                    lines.append(f"{self.name}_bucket{self.format_labels(key, bucket)} {cumulative}")
+                lines.append(f"{self.name}_sum{self.format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{self.format_labels(key)} {cumulative}")
+        return lines
+
+
+class Metrics(metaclass=Singleton):
+    '''
+    Process wide registry rendered in the Prometheus text format.
+    Collectors are called before every render to refresh sampled gauges.
+    '''
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+
+        self.messages_received = self.counter(
+            "ws_tickers_messages_received_total", "Messages received from the exchange", ("exchange",))
+        self.messages_filtered = self.counter(
+            "ws_tickers_messages_filtered_total", "Messages dropped because the pair is not recorded", ("exchange",))
+        self.messages_parsed = self.counter(
+            "ws_tickers_messages_parsed_total", "Messages parsed into a record", ("exchange", "pair"))
+        self.records_inserted = self.counter(
+            "ws_tickers_records_inserted_total", "Records written by a sink", ("backend", "exchange", "pair"))
+        self.insert_errors = self.counter(
+            "ws_tickers_insert_errors_total", "Records a sink failed to write", ("backend",))
+        self.records_spooled = self.counter(
+            "ws_tickers_records_spooled_total", "Records written to the local spool", ("backend",))
+        self.records_replayed = self.counter(
+            "ws_tickers_records_replayed_total", "Records replayed from the local spool", ("backend",))
+        self.spool_bytes = self.gauge(
+            "ws_tickers_spool_bytes", "Bytes waiting in the local spool", ("backend",))
+        self.spool_lost_bytes = self.counter(
+            "ws_tickers_spool_lost_bytes_total", "Spooled bytes deleted to keep the spool under spool_MAX_BYTES", ("backend",))
+        self.insert_latency = self.histogram(
+            "ws_tickers_insert_seconds", "Duration of a sink write call", ("backend",))
+        self.queue_depth = self.gauge(
+            "ws_tickers_queue_depth", "Records waiting in a queue", ("queue",))
+        self.records_shed = self.counter(
+            "ws_tickers_records_shed_total", "Records dropped or conflated by a full feed queue, policy pipe by a full shard queue", ("exchange", "policy"))
+        self.arbitration_discarded = self.counter(
+            "ws_tickers_arbitration_discarded_total", "Tickers and ticker windows discarded because a higher priority exchange is fresh", ("exchange",))
+        self.arbitration_failovers = self.counter(
+            "ws_tickers_arbitration_failovers_total", "Changes of the exchange serving a pair", ("pair", "source"))
+        self.candles_late = self.counter(
+            "ws_tickers_candles_late_total", "Ticks too late for their candle bar", ("exchange", "frame"))
+        self.unknown_symbols = self.counter(
+            "ws_tickers_unknown_symbols_total", "Market ids missing from the symbol registry", ("exchange",))
+        self.reconnects = self.counter(
+            "ws_tickers_reconnects_total", "Exchange connections lost", ("exchange",))
+        self.feed_restarts = self.gauge(
+            "ws_tickers_feed_restarts", "Feed restarts done by the supervisor", ("feed",))
+        self.loop_lag = self.gauge(
+            "ws_tickers_event_loop_lag_seconds", "Last measured event loop lag", ())
+
+    def __register(self, metric: Metric) -> Metric:
+        self.metrics.setdefault(metric.name, metric)
+        return self.metrics[metric.name]
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self.__register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Gauge:
+        return self.__register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = Histogram.default_buckets) -> Histogram:
+        return self.__register(Histogram(name, help, labelnames, buckets))
+
+    def snapshot(self, names: list) -> dict:
+        snapshot = {}
+        for name in names:
+            metric = self.metrics[name]
+            with metric.lock:
+                snapshot[name] = dict(metric.values)
+        return snapshot
+
+    def merge(self, snapshot: dict):
+        # values reported by another process replace the local ones label by label
+        for name, values in snapshot.items():
+            metric = self.metrics.get(name)
+            if metric is not None:
+                with metric.lock:
+                    metric.values.update(values)
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
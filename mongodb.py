@@ -1,11 +1,17 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
 import logging
 import traceback
+from datetime import datetime, timezone
 
 from singleton import Singleton
 from database_config import MongoDataBaseConfig
 from config import Config
 
+DUPLICATE_KEY = 11000
+INDEX_OPTIONS_CONFLICT = 85
+TTL_INDEX = "date_ttl"
+
 '''
 important to use pymongo with srv and tls to connect to mongodb atlas
 python -m pip install pymongo[srv]
@@ -17,35 +23,177 @@ pymongo[tls,srv]==3.11.1
 
 class MongoDataBase(metaclass=Singleton):
 
-    def __init__(self, ticker_priority_exchange):
+    def __init__(self):
         self.logger = logging.getLogger(
             Config.LOGGING_NAME + "." + str(__name__))
         self.client = None
         self.db = None
-        self.ticker_priority_exchange = ticker_priority_exchange
-        self.last_insert = 0
+        # collections whose documents carry a BSON date for time series or TTL
+        self.dated = set()
 
-    
+    def __document(self, collection: str, record) -> dict:
+        document = record.to_document()
+        document['_id'] = record.key()
+        if collection in self.dated:
+            document['date'] = datetime.fromtimestamp(record.epoch, timezone.utc)
+        return document
 
-    def insert(self, collection, document):
+    def insert(self, collection, record):
+        self.insert_many(collection, [record])
 
-        if collection == "tickers" and document["source"] != self.ticker_priority_exchange:
-            diff = document["epoch"] - self.last_insert
-            if diff < 60:
-                self.logger.debug(f"recent ticker insert {diff}s from priority exchange {self.ticker_priority_exchange}, discard ticker insert from {document['source']}")
-                return
-        if self.db != None:
+    def insert_many(self, collection: str, records: list):
+        '''
+        ordered=False lets the server write every valid document of the batch,
+        failed documents are reported one by one from the BulkWriteError details.
+        _id is the record key, a document already stored is a duplicate key error and is skipped.
+        Records with upsert (candles) update the stored document instead, see __upsert_many.
+        '''
+        if self.db != None and records:
+            if records[0].upsert:
+                return self.__upsert_many(collection, records)
+            documents = [self.__document(collection, record) for record in records]
+            failed = set()
             try:
-                result = self.db[collection].insert_one(document)
+                result = self.db[collection].insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                duplicates = 0
+                for error in e.details.get("writeErrors", []):
+                    if error.get("code") == DUPLICATE_KEY:
+                        duplicates += 1
+                        continue
+                    failed.add(error["index"])
+                    self.logger.error(
+                        f"Error insert_many {collection} document:{documents[error['index']]} code:{error.get('code')} {error.get('errmsg')}")
+                if failed and len(failed) == len(documents):
+                    raise e
+                self.logger.debug(f"insert {collection} result:{e.details.get('nInserted')} inserted, {duplicates} duplicates, {len(failed)} failed")
             except Exception as e:
                 self.logger.error(
-                    f"Error insert_one ticker:{e}->{traceback.format_exc()}")
+                    f"Error insert_many {collection}:{e}->{traceback.format_exc()}")
                 raise e
             else:
-                self.logger.debug(f"insert ticker result:{result.inserted_id}")
-                if collection == "tickers" and document["source"] == self.ticker_priority_exchange:
-                    self.last_insert = document["epoch"]
-                return
+                self.logger.debug(f"insert {collection} result:{len(result.inserted_ids)} inserted")
+            return
+
+    def __merge(self, stored: dict, document: dict, merge: dict):
+        for column, rule in merge.items():
+            if rule == "first":
+                document[column] = stored[column]
+            elif rule == "max":
+                document[column] = max(stored[column], document[column])
+            elif rule == "min":
+                document[column] = min(stored[column], document[column])
+
+    def __update(self, document: dict, merge: dict) -> UpdateOne:
+        # merged columns use $setOnInsert/$max/$min so a partial record never overwrites them
+        operators = {'first': '$setOnInsert', 'max': '$max', 'min': '$min'}
+        update = {'$set': {}}
+        for column, value in document.items():
+            if column == '_id':
+                continue
+            operator = operators.get(merge.get(column), '$set')
+            update.setdefault(operator, {})[column] = value
+        return UpdateOne({'_id': document['_id']}, update, upsert=True)
+
+    def __upsert_many(self, collection: str, records: list):
+        # unordered writes may run in any order, the states of every key are merged and sent once
+        merge = records[0].merge
+        documents = {}
+        for record in records:
+            document = self.__document(collection, record)
+            stored = documents.get(document['_id'])
+            if stored is not None:
+                self.__merge(stored, document, merge)
+            documents[document['_id']] = document
+        documents = list(documents.values())
+        requests = [self.__update(document, merge) for document in documents]
+        try:
+            result = self.db[collection].bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            for error in errors:
+                self.logger.error(
+                    f"Error upsert {collection} document:{documents[error['index']]} code:{error.get('code')} {error.get('errmsg')}")
+            if len(errors) == len(requests):
+                raise e
+        except Exception as e:
+            self.logger.error(
+                f"Error upsert {collection}:{e}->{traceback.format_exc()}")
+            raise e
+        else:
+            self.logger.debug(f"upsert {collection} result:{result.upserted_count} inserted, {result.modified_count} modified")
+
+    def __setup_timeseries(self, db, name: str, expire: int) -> bool:
+        '''
+        returns False when the server has no time series collections (< 5.0).
+        _id is not unique in a time series collection, duplicates are not detected.
+        '''
+        info = next(db.list_collections(filter={'name': name}), None)
+        try:
+            if info is None:
+                options = {'timeseries': {'timeField': 'date', 'metaField': 'pair', 'granularity': 'seconds'}}
+                if expire:
+                    options['expireAfterSeconds'] = expire
+                db.create_collection(name, **options)
+                self.logger.info(f"Created time series collection {name}, expire after {expire}s")
+                return True
+            if info.get('type') != 'timeseries':
+                return False
+            db.command({'collMod': name, 'expireAfterSeconds': expire if expire else "off"})
+            return True
+        except OperationFailure as e:
+            self.logger.warning(f"Time series collection {name} not available, using indexes:{e}")
+            return False
+
+    def __setup_indexes(self, db, name: str, expire: int):
+        collection = db[name]
+        collection.create_index([("pair", 1), ("source", 1), ("epoch", 1)], name="pair_source_epoch")
+        if not expire:
+            if TTL_INDEX in collection.index_information():
+                collection.drop_index(TTL_INDEX)
+            return
+        try:
+            collection.create_index("date", name=TTL_INDEX, expireAfterSeconds=expire)
+        except OperationFailure as e:
+            if e.code != INDEX_OPTIONS_CONFLICT:
+                raise e
+            # the retention changed
+            db.command({'collMod': name, 'index': {'name': TTL_INDEX, 'expireAfterSeconds': expire}})
+
+    def setup_collections(self, db, collections: dict = Config.mongo_COLLECTIONS):
+        '''
+        time series collections or compound indexes, retention by TTL on the date field
+        '''
+        for name, options in collections.items():
+            days = options.get('retention_days')
+            expire = int(days * 86400) if days else None
+            try:
+                if not (options.get('timeseries') and self.__setup_timeseries(db, name, expire)):
+                    self.__setup_indexes(db, name, expire)
+            except Exception as e:
+                self.logger.error(f"Error setting up collection {name}:{e}->{traceback.format_exc()}")
+            if options.get('timeseries') or expire:
+                self.dated.add(name)
+
+    def storage(self) -> dict:
+        '''
+        size of the documents, on disk size and index size per collection in bytes
+        '''
+        if self.db == None:
+            return {}
+        report = {}
+        for name in Config.mongo_COLLECTIONS:
+            try:
+                stats = self.db.command('collStats', name)
+            except OperationFailure as e:
+                report[name] = {'error': str(e)}
+                continue
+            report[name] = {'count': stats.get('count'),
+                            'size': stats.get('size'),
+                            'storage_size': stats.get('storageSize'),
+                            'index_size': stats.get('totalIndexSize'),
+                            'indexes': stats.get('indexSizes')}
+        return report
 
     def close(self):
         self.client.close()
@@ -81,7 +229,9 @@ class MongoDataBase(metaclass=Singleton):
         else:
             if response['ok'] == 1.0:
                 self.logger.info(f"DB Connected OK:{response}")
+                self.setup_collections(db)
                 self.client = client
                 self.db = db
+                self.logger.info(f"DB storage:{self.storage()}")
             else:
                 self.logger.error(f"DB Connected ERROR:{response}")
@@ -0,0 +1,32 @@
+import asyncio
+import logging
+
+from config import Config
+from metrics import Metrics
+from profiler import Profiler
+
+
+class LoopLagMonitor:
+    '''
+    sleeps interval seconds and measures how late the loop wakes it up,
+    anything blocking the event loop shows up as lag
+    '''
+
+    def __init__(self, interval: float = Config.monitor_LAG_INTERVAL):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.interval = interval
+        self.lag = 0.0
+        self.metrics = Metrics()
+        self.profiler = Profiler()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - start - self.interval)
+            self.metrics.loop_lag.set(self.lag)
+            self.profiler.record("event_loop.lag", self.lag)
+            if self.lag > Config.monitor_LAG_WARNING:
+                self.logger.warning(f"Event loop blocked for {self.lag:.3f}s")
@@ -10,66 +10,65 @@ from config import Config
 
 class MysqlDataBase(metaclass=Singleton):
 
-    def __init__(self, ticker_priority_exchange):
+    def __init__(self):
         self.logger = logging.getLogger(
             Config.LOGGING_NAME + "." + str(__name__))
         self.connection = None
-        self.ticker_priority_exchange = ticker_priority_exchange
-        self.last_insert = 0
-
-
-
-    def __parse_sql(self,table : str,row : dict):
-        if type(table) != str and type(row) != dict:
-            return False
-        sql = "insert into " + table + " ("
-        row = {k:v for k,v in row.items() if type(k) == str and not k.startswith("_")}
-        for key in row:
-            sql += key + ","
-        sql = sql[:-1]
-        sql += ") values("
-        for key in row:
-            if type(row[key]) == str:
-                sql += "'" + row[key] + "',"
-            else:
-                sql += str(row[key]) + ","
-        sql = sql[:-1]
-        sql += ")"
-        return sql
 
-    
 
-    def insert(self, table, row):
 
-        if table == "tickers" and row["source"] != self.ticker_priority_exchange:
-            diff = row["epoch"] - self.last_insert
-            if diff < 60:
-                self.logger.debug(f"recent ticker insert {diff}s from priority exchange {self.ticker_priority_exchange}, discard ticker insert from {row['source']}")
-                return
-        if self.connection != None:
-            lastrowid = -1
+    def __parse_sql(self, table: str, record_type) -> str:
+        columns = record_type.columns
+        fields = ",".join("`" + column + "`" for column in columns)
+        placeholders = ",".join(["%s"] * len(columns))
+        if record_type.upsert:
+            # candles are rewritten while the bar is forming, the unique key is (source,pair,frame,epoch)
+            updates = ",".join(self.__parse_update(column, record_type.merge.get(column)) for column in columns
+                               if column not in record_type.key_columns and record_type.merge.get(column) != "first")
+            return f"insert into `{table}` ({fields}) values ({placeholders}) on duplicate key update {updates}"
+        # rows already stored (spool replay) hit the unique key and are left as they are
+        return f"insert into `{table}` ({fields}) values ({placeholders}) on duplicate key update `epoch`=`epoch`"
+
+    def __parse_update(self, column: str, merge: str) -> str:
+        if merge == "max":
+            return f"`{column}`=greatest(`{column}`,values(`{column}`))"
+        if merge == "min":
+            return f"`{column}`=least(`{column}`,values(`{column}`))"
+        return f"`{column}`=values(`{column}`)"
+
+    def insert(self, table, row):
+        self.insert_many(table, [row])
+
+    def insert_many(self, table: str, rows: list):
+        '''
+        rows (Ticker, Candle) of the same type are sent in a single parameterized executemany,
+        pymysql rewrites it as one multi-row VALUES statement. One commit per call.
+        '''
+        if self.connection != None and rows:
+            groups = {}
+            for row in rows:
+                groups.setdefault(type(row), []).append(row.to_row())
             try:
-                sql = self.__parse_sql(table,row)
-                self.logger.debug(sql)
-                if sql:
-                    with self.connection.cursor() as cursor:
-                        cursor.execute(sql)
-                        lastrowid = cursor.lastrowid
-                    self.connection.commit()
+                self.connection.ping(reconnect=True)
+                rowcount = 0
+                with self.connection.cursor() as cursor:
+                    for record_type, params in groups.items():
+                        sql = self.__parse_sql(table, record_type)
+                        self.logger.debug(f"{sql} x {len(params)}")
+                        rowcount += cursor.executemany(sql, params)
+                self.connection.commit()
 
             except pymysql.OperationalError as error:
                 self.logger.error(
-                    f"OperationalError ticker:{error}->{traceback.format_exc()}")
-                raise e
+                    f"OperationalError {table}:{error}->{traceback.format_exc()}")
+                raise error
 
             except Exception as e:
                 self.logger.error(
-                    f"Error insert mysql ticker:{e}->{traceback.format_exc()}")
+                    f"Error insert mysql {table}:{e}->{traceback.format_exc()}")
                 raise e
             else:
-                self.logger.debug(f"insert ticker result:{lastrowid}")
-                if table == "tickers" and row["source"] == self.ticker_priority_exchange:
-                    self.last_insert = row["epoch"]
+                self.logger.debug(f"insert {table} rows:{rowcount}")
                 return
 
     def close(self):
@@ -0,0 +1,124 @@
+import logging
+import time
+import traceback
+from datetime import datetime, timezone
+
+from config import Config
+
+'''
+Lifecycle of the RANGE partitioned MySQL tables. Partitions are named after
+the day or month they start (p20201210, p202012) and hold epochs lower than
+the start of the next period. The last partition is always pmax, new
+partitions are split from it ahead of time, so pmax stays empty and the
+split is cheap. Retention drops whole partitions instead of running DELETEs.
+'''
+
+PERIODS = ("day", "month")
+MAX_PARTITION = "pmax"
+
+
+def period_start(epoch: float, period: str) -> datetime:
+    date = datetime.fromtimestamp(epoch, timezone.utc)
+    if period == "month":
+        return date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_period(start: datetime, period: str) -> datetime:
+    if period == "month":
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return datetime.fromtimestamp(start.timestamp() + 86400, timezone.utc)
+
+
+def partition_name(start: datetime, period: str) -> str:
+    return "p" + start.strftime("%Y%m" if period == "month" else "%Y%m%d")
+
+
+class PartitionManager:
+
+    def __init__(self, database, tables: list = Config.mysql_PARTITIONED_TABLES,
+                 period: str = Config.mysql_PARTITION_PERIOD,
+                 ahead: int = Config.mysql_PARTITIONS_AHEAD,
+                 retention: dict = Config.mysql_RETENTION_DAYS):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        if period not in PERIODS:
+            raise ValueError(f"Unknown partition period {period}, expected one of {PERIODS}")
+        self.database = database
+        self.tables = tables
+        self.period = period
+        self.ahead = ahead
+        self.retention = retention
+
+    def partitions(self, cursor, table: str) -> list:
+        '''
+        [(name, bound)] in order, bound is None for pmax
+        '''
+        cursor.execute("select partition_name as name, partition_description as bound "
+                       "from information_schema.partitions "
+                       "where table_schema = database() and table_name = %s and partition_name is not null "
+                       "order by partition_ordinal_position", (table,))
+        return [(row['name'], None if row['bound'] == "MAXVALUE" else int(row['bound']))
+                for row in cursor.fetchall()]
+
+    def oldest(self, cursor, table: str):
+        cursor.execute(f"select min(epoch) as oldest from `{table}`")
+        row = cursor.fetchone()
+        return None if row is None else row['oldest']
+
+    def __create_ahead(self, cursor, table: str, partitions: list, now: float) -> list:
+        bounds = [bound for _name, bound in partitions if bound is not None]
+        if bounds:
+            start = datetime.fromtimestamp(max(bounds), timezone.utc)
+        else:
+            # the first split starts at the oldest row, history is not left in one partition
+            oldest = self.oldest(cursor, table)
+            start = period_start(now if oldest is None else min(oldest, now), self.period)
+        last = period_start(now, self.period)
+        for _ in range(self.ahead):
+            last = next_period(last, self.period)
+        new = []
+        while start <= last:
+            end = next_period(start, self.period)
+            new.append(f"partition `{partition_name(start, self.period)}` values less than ({int(end.timestamp())})")
+            start = end
+        if new:
+            new.append(f"partition `{MAX_PARTITION}` values less than maxvalue")
+            cursor.execute(f"alter table `{table}` reorganize partition `{MAX_PARTITION}` into ({', '.join(new)})")
+            self.logger.info(f"{table}: created {len(new) - 1} partitions")
+        return new
+
+    def __drop_expired(self, cursor, table: str, partitions: list, now: float) -> list:
+        days = self.retention.get(table)
+        if not days:
+            return []
+        cutoff = now - days * 86400
+        # every row of a partition is older than its bound
+        expired = [name for name, bound in partitions if bound is not None and bound <= cutoff]
+        if expired:
+            cursor.execute(f"alter table `{table}` drop partition {', '.join('`' + name + '`' for name in expired)}")
+            self.logger.info(f"{table}: dropped partitions {expired}, retention {days} days")
+        return expired
+
+    def maintain(self, now: float = None):
+        '''
+        blocking, runs in the mysql sink thread
+        '''
+        connection = self.database.connection
+        if connection is None:
+            return
+        now = time.time() if now is None else now
+        connection.ping(reconnect=True)
+        with connection.cursor() as cursor:
+            for table in self.tables:
+                try:
+                    partitions = self.partitions(cursor, table)
+                    if not partitions or partitions[-1][0] != MAX_PARTITION:
+                        self.logger.warning(
+                            f"{table} is not partitioned by epoch with a {MAX_PARTITION} partition, "
+                            f"apply sql/migrations/0002_partitioned_tables.sql")
+                        continue
+                    self.__drop_expired(cursor, table, partitions, now)
+                    self.__create_ahead(cursor, table, partitions, now)
+                except Exception as e:
+                    self.logger.error(f"Error maintaining {table} partitions:{e}->{traceback.format_exc()}")
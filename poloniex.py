@@ -1,14 +1,10 @@
 import logging
-import asyncio
 import websockets
-import json
+import codec
 import traceback
-import sys
-import time
-from collections import defaultdict
-from mongodb import MongoDataBase
-from mysqldb import MysqlDataBase
-from datetime import datetime
+from records import Ticker
+from timeutil import stamp
+from symbols import SymbolRegistry
 
 
 from config import Config
@@ -19,30 +15,79 @@ from exchange import Exchange
  
 class Poloniex(Exchange):
 
-    def __init__(self, mongodb: MongoDataBase, mysqldb: MysqlDataBase , pairs_to_record: list):
+    name = "poloniex"
 
+    def __init__(self, sinks: list, pairs_to_record: list, channels: list = None):
+
+        super().__init__(sinks)
 
         # dot notation parent.child
         self.logger = logging.getLogger(
             Config.LOGGING_NAME + "." + str(__name__))
         self.logger.debug(f"Init {str(__name__)}")
-
-        self.mongodb = mongodb
-        self.mysqldb = mysqldb
-        self.logger.debug(f"mongodb id:{id(self.mongodb)}")
-        self.logger.debug(f"mysqldb id:{id(self.mysqldb)}")
-
-
-        self.min_diff_to_insert = 10
-        self.last_insert_epoch = defaultdict(int)
-
-        self.pairs_to_record = [ base + "_" + quote for base,quote in pairs_to_record]
-        self.pair_ids = defaultdict(str)
-        with open('./json/poloniex_usdt_pair_ids.json', 'r') as file:
-            self.pair_ids.update(json.load(file))
+        self.logger.debug(f"sinks:{[sink.name for sink in self.sinks]}")
+
+        self.symbols = SymbolRegistry()
+        self.pairs = list(pairs_to_record)
+        self.pairs_to_record = [self.symbols.instrument(self.name, base, quote).pair for base, quote in self.pairs]
+        self.pair_ids_to_record = self.__pair_ids()
+        # ids of every market in the registry, by_id is only asked about the others
+        self.known_ids = set()
+        self.symbols_version = None
+        self.ws_uri = Config.poloniex_WS_URI
+        self.channel = 1002
+        self.frame_prefix = f"[{self.channel},"
+        self.frames_accepted = 0
+        self.frames_dropped = 0
+
+    def __pair_ids(self) -> dict:
+        '''
+        market id -> pair of the recorded pairs, rebuilt on every connection
+        and whenever the registry is refreshed
+        '''
+        pair_ids = {}
+        for base, quote in self.pairs:
+            instrument = self.symbols.instrument(self.name, base, quote)
+            if instrument.id is None:
+                self.logger.error(f"No poloniex market id for {instrument.pair}, it is not recorded")
+                continue
+            pair_ids[instrument.id] = instrument.pair
+        return pair_ids
+
+    def __load_ids(self):
+        self.symbols_version = self.symbols.version
+        self.pair_ids_to_record = self.__pair_ids()
+        self.known_ids = self.symbols.known_ids(self.name)
+
+    async def update_pairs(self, added: list, removed: list):
+        # channel 1002 sends every market, pairs are filtered here without resubscribing
+        self.pairs_to_record = [self.symbols.instrument(self.name, base, quote).pair for base, quote in self.pairs]
+        self.pair_ids_to_record = self.__pair_ids()
+
+    def subscribe_message(self) -> dict:
+        return {"command": "subscribe", "channel": self.channel}
+
+    def stats(self) -> dict:
+        return {'accepted': self.frames_accepted, 'dropped': self.frames_dropped}
+
+    def __pair_id_from_frame(self, frame: str) -> int:
+        '''
+        ticker frames look like [1002,null,[121,"18000.1","18001.2",...]]
+        read the pair id without decoding the whole frame
+        '''
+        if not frame.startswith(self.frame_prefix):
+            return None
+        start = frame.find('[', len(self.frame_prefix))
+        if start < 0:
+            return None
+        end = frame.find(',', start)
+        try:
+            return int(frame[start + 1:end])
+        except ValueError:
+            return None
 
 
-    def __parse_ticker_response(self, response: list) -> dict:
+    def __parse_ticker_response(self, response: list) -> Ticker:
 
         if type(response) == list and len(response) == 3:
             _channel, _sequence_id, ticker = response
@@ -50,84 +95,69 @@ class Poloniex(Exchange):
         else:
             return None
 
-    def __parse_ticker(self, ticker: list) -> dict:
+    def __parse_ticker(self, ticker: list) -> Ticker:
         if type(ticker) == list and len(ticker) == 10:
             currency_pair_id = int(ticker[0])
-            currency_pair = self.pair_ids[str(currency_pair_id)]
-            if currency_pair in self.pairs_to_record:
-                new_ticker = {}
-                new_ticker['source'] = "poloniex"
-                new_ticker['epoch'] = int(time.time())
-                new_ticker['ts'] = datetime.utcfromtimestamp(new_ticker['epoch']).strftime('%Y-%m-%d %H:%M:%S')
-                new_ticker['pair'] = str(currency_pair)
-                new_ticker['last'] = float(ticker[1])
-                new_ticker['ask'] = float(ticker[2])
-                new_ticker['bid'] = float(ticker[3])
-                return new_ticker
+            currency_pair = self.pair_ids_to_record.get(currency_pair_id)
+            if currency_pair is not None:
+                epoch, epoch_ms = stamp()
+                return Ticker(source=self.name,
+                              pair=currency_pair,
+                              epoch=epoch,
+                              last=float(ticker[1]),
+                              ask=float(ticker[2]),
+                              bid=float(ticker[3]),
+                              epoch_ms=epoch_ms)
             else:
                 return None
         else:
             return None
 
-    def __insert_ticker(self,ticker):
-        insert_diff = ticker['epoch'] - self.last_insert_epoch[ticker['pair']]
-        if (insert_diff > self.min_diff_to_insert):
-            try:
-                self.logger.debug(f"Poloniex:{ticker}")
-                self.mongodb.insert("tickers",ticker)
-                self.mysqldb.insert("tickers",ticker)
-                self.last_insert_epoch[ticker['pair']] = ticker['epoch']
-            except Exception as e:
-                self.logger.error("Error in  Database")
-                raise e
-
-
-    async def get_tickers(self,lock):
-        ws_uri = "wss://api2.poloniex.com"
-        channel = 1002
-        
-        
-        while True:
-            try:
-                self.logger.debug("Starting connection with Poloniex")
-                async with websockets.connect(ws_uri) as websocket:
-                    data = {"command": "subscribe", "channel": channel}
-                    await websocket.send(json.dumps(data))
-                    while True:
-                        try:
-                            r = await websocket.recv()
-                        except websockets.exceptions.ConnectionClosed as e:
-                            self.logger.error(
-                                f"websockets.exceptions.ConnectionClosed:{e}>{traceback.format_exc()}")
-                            break
-                        except Exception as e:
-                            self.logger.error(
-                                f"Exception:{e}->{traceback.format_exc()}")
-                            break
-                        else:
-                            response = json.loads(r)
-                            ticker = self.__parse_ticker_response(response)
-                            if ticker is not None:
-                                insert_diff = ticker['epoch'] - self.last_insert_epoch[ticker['pair']]
-                                if (insert_diff > self.min_diff_to_insert):
-                                    self.logger.debug(f"Poloniex:{ticker}")
-                                    try:
-                                        async with lock:
-                                             self.mongodb.insert("tickers",ticker)
-                                    except Exception as e:
-                                        self.logger.error(f"Exception in Insert MongoDataBase:{e}->{traceback.format_exc()}")
-                                        return
-                                    try:
-                                        async with lock:
-                                             self.mysqldb.insert("tickers",ticker)
-                                    except Exception as e:
-                                        self.logger.error(f"Exception in Insert MysqlDataBase:{e}->{traceback.format_exc()}")
-                                        return
-                                    self.last_insert_epoch[ticker['pair']] = ticker['epoch']
- 
-            except Exception as e:
-                self.logger.error(f"Exception:{e}->{traceback.format_exc()}")
-
-            self.logger.info("Connection lost with poloniex")
-            await asyncio.sleep(5)
+    async def get_tickers(self):
+        # a single connection, the Supervisor reconnects with its backoff when it ends or fails
+        try:
+            self.logger.debug("Starting connection with Poloniex")
+            self.__load_ids()
+            async with websockets.connect(self.ws_uri) as websocket:
+                await websocket.send(codec.dumps(self.subscribe_message()))
+                while True:
+                    timer = self.profiler.timer(self.name)
+                    try:
+                        r = await websocket.recv()
+                    except websockets.exceptions.ConnectionClosed as e:
+                        self.logger.error(
+                            f"websockets.exceptions.ConnectionClosed:{e}>{traceback.format_exc()}")
+                        break
+                    if timer:
+                        timer.mark("recv")
+                    self.metrics.messages_received.inc(exchange=self.name)
+                    self.health.message(self.name)
+                    pair_id = self.__pair_id_from_frame(r)
+                    if pair_id is None:
+                        continue
+                    if self.symbols_version != self.symbols.version:
+                        self.__load_ids()
+                    if pair_id not in self.pair_ids_to_record:
+                        if pair_id not in self.known_ids:
+                            # reports ids missing from the registry, once per connection
+                            self.symbols.by_id(self.name, pair_id)
+                            self.known_ids.add(pair_id)
+                        self.frames_dropped += 1
+                        self.metrics.messages_filtered.inc(exchange=self.name)
+                        continue
+                    self.frames_accepted += 1
+                    response = codec.loads(r)
+                    if timer:
+                        timer.mark("json.loads")
+                    ticker = self.__parse_ticker_response(response)
+                    if timer:
+                        timer.mark("parse")
+                    if ticker is not None:
+                        self.metrics.messages_parsed.inc(exchange=self.name, pair=ticker.pair)
+                        await self.insert_ticker(ticker)
+                        if timer:
+                            timer.mark("enqueue")
+        finally:
+            self.metrics.reconnects.inc(exchange=self.name)
+            self.logger.info(f"Connection lost with poloniex, frames:{self.stats()}")
 
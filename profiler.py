@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from config import Config
+from metrics import Metrics
+from singleton import Singleton
+
+
+class StageTimer:
+
+    __slots__ = ('profiler', 'prefix', 'last')
+
+    def __init__(self, profiler, prefix: str):
+        self.profiler = profiler
+        self.prefix = prefix
+        self.last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.profiler.record(self.prefix + "." + stage, now - self.last)
+        self.last = now
+
+
+class Profiler(metaclass=Singleton):
+    '''
+    Sampling stage timer for the hot paths. timer() returns a StageTimer for
+    one message every Config.profiler_SAMPLE_EVERY and None otherwise, so an
+    unsampled message only costs a counter increment.
+    '''
+
+    def __init__(self, sample_every: int = Config.profiler_SAMPLE_EVERY):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.sample_every = sample_every
+        self.calls = 0
+        self.stages = {}
+        self.histogram = Metrics().histogram(
+            "ws_tickers_stage_seconds", "Sampled duration of a hot path stage", ("stage",),
+            buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+
+    def timer(self, prefix: str) -> StageTimer:
+        if self.sample_every <= 0:
+            return None
+        self.calls += 1
+        if self.calls % self.sample_every:
+            return None
+        return StageTimer(self, prefix)
+
+    def record(self, stage: str, seconds: float):
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = {'count': 0, 'total': 0.0, 'max': 0.0,
+                                          'recent': deque(maxlen=Config.profiler_WINDOW)}
+        stats['count'] += 1
+        stats['total'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+        stats['recent'].append(seconds)
+        self.histogram.observe(seconds, stage=stage)
+
+    def report(self) -> dict:
+        report = {}
+        for stage, stats in self.stages.items():
+            recent = sorted(stats['recent'])
+            report[stage] = {
+                'count': stats['count'],
+                'mean': stats['total'] / stats['count'],
+                'p50': recent[len(recent) // 2],
+                'p99': recent[min(len(recent) - 1, int(len(recent) * 0.99))],
+                'max': stats['max'],
+            }
+        return report
+
+    async def run(self, interval: float = Config.profiler_LOG_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            for stage, stats in sorted(self.report().items()):
+                self.logger.info(
+                    f"stage {stage}: count:{stats['count']} p50:{stats['p50'] * 1000:.3f}ms p99:{stats['p99'] * 1000:.3f}ms max:{stats['max'] * 1000:.3f}ms")
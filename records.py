@@ -0,0 +1,117 @@
+from typing import NamedTuple
+
+from timeutil import format_ts, milliseconds
+
+'''
+Immutable records shared by every exchange. They stay tuples on the hot path
+and are only turned into a Mongo document or a SQL parameter tuple by the sink.
+'''
+
+
+class Ticker(NamedTuple):
+    source: str
+    pair: str
+    epoch: int
+    last: float
+    ask: float
+    bid: float
+    epoch_ms: int = None
+
+    columns = ('source', 'epoch', 'ts', 'pair', 'last', 'ask', 'bid') + (
+        ('epoch_ms',) if milliseconds() else ())
+    # a stored ticker never changes, a second write of the same key is ignored
+    upsert = False
+
+    @property
+    def ts(self) -> str:
+        return format_ts(self.epoch)
+
+    def key(self) -> str:
+        # identity used by the sinks to drop records stored twice (spool replay)
+        epoch = self.epoch if self.epoch_ms is None else self.epoch_ms
+        return f"{self.source}:{self.pair}:{epoch}"
+
+    def to_row(self) -> tuple:
+        row = (self.source, self.epoch, self.ts, self.pair, self.last, self.ask, self.bid)
+        if milliseconds():
+            return row + (self.epoch_ms,)
+        return row
+
+    def to_document(self) -> dict:
+        return dict(zip(self.columns, self.to_row()))
+
+
+class Candle(NamedTuple):
+    source: str
+    pair: str
+    frame: int
+    epoch: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+    columns = ('source', 'frame', 'epoch', 'ts', 'pair', 'open', 'high', 'low', 'close', 'volume')
+    # a bar is written again while it is forming, the last write wins except for
+    # the merged columns, a partial bar (open on shut down) keeps its open and extremes
+    upsert = True
+    key_columns = ('source', 'pair', 'frame', 'epoch')
+    merge = {'open': 'first', 'high': 'max', 'low': 'min'}
+
+    @property
+    def ts(self) -> str:
+        return format_ts(self.epoch)
+
+    def key(self) -> str:
+        return f"{self.source}:{self.pair}:{self.frame}:{self.epoch}"
+
+    def to_row(self) -> tuple:
+        return (self.source, self.frame, self.epoch, self.ts, self.pair,
+                self.open, self.high, self.low, self.close, self.volume)
+
+    def to_document(self) -> dict:
+        return dict(zip(self.columns, self.to_row()))
+
+
+class TickerWindow(NamedTuple):
+    '''
+    aggregate of the tickers of one pair received during a conflation window,
+    epoch is the window start and frame its length in seconds
+    '''
+    source: str
+    pair: str
+    frame: int
+    epoch: int
+    count: int
+    last_min: float
+    last_max: float
+    last: float
+    bid_min: float
+    bid_max: float
+    bid: float
+    ask_min: float
+    ask_max: float
+    ask: float
+
+    columns = ('source', 'frame', 'epoch', 'ts', 'pair', 'count', 'last_min', 'last_max', 'last',
+               'bid_min', 'bid_max', 'bid', 'ask_min', 'ask_max', 'ask')
+    upsert = False
+
+    @property
+    def ts(self) -> str:
+        return format_ts(self.epoch)
+
+    def key(self) -> str:
+        return f"{self.source}:{self.pair}:{self.frame}:{self.epoch}"
+
+    def to_row(self) -> tuple:
+        return (self.source, self.frame, self.epoch, self.ts, self.pair, self.count,
+                self.last_min, self.last_max, self.last, self.bid_min, self.bid_max, self.bid,
+                self.ask_min, self.ask_max, self.ask)
+
+    def to_document(self) -> dict:
+        return dict(zip(self.columns, self.to_row()))
+
+
+RECORD_TYPES = {'Ticker': Ticker, 'Candle': Candle, 'TickerWindow': TickerWindow}
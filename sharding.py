@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from health import Health
+from metrics import Metrics
+
+'''
+Multi-process mode (Config.PROCESS_SHARDS). Every shard is a worker process
+running a subset of the feeds in its own event loop. Workers send batches of
+records and heartbeats (feed freshness, counters) over a multiprocessing
+queue to the parent, which owns the database sinks and the HTTP server.
+On shut down the parent sets the stop event of every worker, which closes
+its feeds, flushes what is left and reports "stopped" on the same queue.
+'''
+
+EXCHANGE_METRICS = ["ws_tickers_messages_received_total", "ws_tickers_messages_filtered_total",
+                    "ws_tickers_messages_parsed_total", "ws_tickers_reconnects_total",
+                    "ws_tickers_records_shed_total", "ws_tickers_candles_late_total",
+                    "ws_tickers_unknown_symbols_total"]
+
+
+class PipeSink:
+    '''
+    sink used inside a worker, batches records onto the parent queue.
+    A full queue drops the batch instead of blocking the worker loop.
+    '''
+
+    def __init__(self, channel, shard: int, batch_size: int = Config.shard_BATCH_SIZE):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.name = f"shard{shard}"
+        self.channel = channel
+        self.shard = shard
+        self.batch_size = batch_size
+        self.buffer = []
+        self.dropped = 0
+
+    async def insert(self, collection: str, record):
+        self.buffer.append((collection, record))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self, timeout: float = None):
+        # timeout waits for room in the queue instead of dropping, used by the final flush
+        if not self.buffer:
+            return
+        try:
+            if timeout is None:
+                self.channel.put_nowait(("records", self.shard, self.buffer))
+            else:
+                self.channel.put(("records", self.shard, self.buffer), timeout=timeout)
+        except queue.Full:
+            self.dropped += len(self.buffer)
+            # reported with the feed queue losses, merged into the parent by the heartbeat
+            for _collection, record in self.buffer:
+                Metrics().records_shed.inc(exchange=record.source, policy="pipe")
+            self.logger.error(f"{self.name} queue full, {len(self.buffer)} records dropped, total:{self.dropped}")
+        self.buffer = []
+
+    def heartbeat(self, supervisor):
+        message = {'health': Health().exchanges(),
+                   'metrics': Metrics().snapshot(EXCHANGE_METRICS),
+                   'feeds': supervisor.stats(),
+                   'dropped': self.dropped}
+        try:
+            self.channel.put_nowait(("heartbeat", self.shard, message))
+        except queue.Full:
+            pass
+
+    async def run(self, supervisor):
+        loop = asyncio.get_running_loop()
+        next_heartbeat = loop.time()
+        while True:
+            await asyncio.sleep(Config.shard_FLUSH_INTERVAL)
+            self.flush()
+            if loop.time() >= next_heartbeat:
+                self.heartbeat(supervisor)
+                next_heartbeat = loop.time() + Config.shard_HEARTBEAT_INTERVAL
+
+
+async def wait_stop(stop):
+    while not stop.is_set():
+        await asyncio.sleep(Config.shard_FLUSH_INTERVAL)
+
+
+async def run_shard(shard: int, feeds: list, channel, stop):
+    # imported here, the worker is a spawned process
+    from feeds import load_feeds, create_exchange, FeedWatcher
+    from supervisor import Supervisor
+    from symbols import SymbolRegistry
+
+    sink = PipeSink(channel, shard)
+    supervisor = Supervisor()
+    exchanges = []
+    config = load_feeds()
+    for name in feeds:
+        exchange = create_exchange(name, [sink], config)
+        exchanges.append(exchange)
+        supervisor.add(name, exchange.get_tickers)
+    supervisor.start()
+    pipe_task = asyncio.create_task(sink.run(supervisor))
+    started = {name for shard_feeds in Config.PROCESS_SHARDS for name in shard_feeds}
+    watcher_task = asyncio.create_task(FeedWatcher(exchanges, started=started).run())
+    symbols_task = asyncio.create_task(SymbolRegistry().run()) if Config.symbols_REFRESH_INTERVAL else None
+    feeds_task = asyncio.create_task(supervisor.wait())
+    stop_task = asyncio.create_task(wait_stop(stop))
+    try:
+        await asyncio.wait([feeds_task, stop_task], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stop_task.cancel()
+        await supervisor.stop()
+        pipe_task.cancel()
+        watcher_task.cancel()
+        if symbols_task is not None:
+            symbols_task.cancel()
+        for exchange in exchanges:
+            await exchange.close()
+        sink.flush(Config.shard_STOP_TIMEOUT)
+        try:
+            channel.put(("stopped", shard, None), timeout=Config.shard_STOP_TIMEOUT)
+        except queue.Full:
+            pass
+
+
+def shard_main(shard: int, feeds: list, channel, stop):
+    from main import configure_logging
+    # Ctrl+C reaches the whole process group, the parent stops the workers through stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger = configure_logging(Config.LOGGING_NAME)
+    logger.info(f"Start shard {shard} with feeds {feeds}")
+    asyncio.run(run_shard(shard, feeds, channel, stop))
+
+
+class ShardManager:
+    '''
+    parent side: starts the worker processes, forwards their records to the
+    sinks and merges their heartbeats into Health and Metrics
+    '''
+
+    def __init__(self, shards: list, sinks: list):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.shards = shards
+        self.sinks = sinks
+        self.context = multiprocessing.get_context("spawn")
+        self.channel = self.context.Queue(maxsize=Config.shard_QUEUE_SIZE)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shards")
+        self.processes = {}
+        self.stops = {}
+        self.stopped = set()
+        self.heartbeats = {}
+        for feeds in shards:
+            for name in feeds:
+                Health().register_exchange(name)
+
+    def stats(self) -> dict:
+        return {f"shard{shard}": {'feeds': feeds,
+                                  'pid': self.processes[shard].pid if shard in self.processes else None,
+                                  'alive': shard in self.processes and self.processes[shard].is_alive(),
+                                  'heartbeat': self.heartbeats.get(shard)}
+                for shard, feeds in enumerate(self.shards)}
+
+    async def run_worker(self, shard: int):
+        '''
+        coroutine for the Supervisor, returns when the worker process dies,
+        the process is left running when cancelled, close() stops it
+        '''
+        stop = self.context.Event()
+        process = self.context.Process(target=shard_main, args=(shard, self.shards[shard], self.channel, stop),
+                                       name=f"shard{shard}", daemon=True)
+        process.start()
+        self.processes[shard] = process
+        self.stops[shard] = stop
+        self.logger.info(f"Started shard{shard} pid:{process.pid} feeds:{self.shards[shard]}")
+        while process.is_alive():
+            await asyncio.sleep(1)
+        self.logger.error(f"shard{shard} pid:{process.pid} exited with code {process.exitcode}")
+
+    def __get(self):
+        try:
+            return self.channel.get(timeout=1)
+        except queue.Empty:
+            return None
+
+    async def run_reader(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await loop.run_in_executor(self.executor, self.__get)
+            if message is None:
+                continue
+            kind, shard, payload = message
+            try:
+                if kind == "records":
+                    for collection, record in payload:
+                        for sink in self.sinks:
+                            await sink.insert(collection, record)
+                elif kind == "stopped":
+                    self.stopped.add(shard)
+                elif kind == "heartbeat":
+                    Health().merge_exchanges(payload['health'])
+                    Metrics().merge(payload['metrics'])
+                    self.heartbeats[shard] = {'feeds': payload['feeds'], 'dropped': payload['dropped']}
+            except Exception as e:
+                self.logger.error(f"Error handling {kind} from shard{shard}:{e}->{traceback.format_exc()}")
+
+    async def close(self, timeout: float = Config.shard_STOP_TIMEOUT):
+        '''
+        asks every worker to stop and waits for its final records, run_reader
+        must still be running to forward them. Workers still alive after
+        timeout are terminated.
+        '''
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        running = {shard for shard, process in self.processes.items() if process.is_alive()}
+        for shard in running:
+            self.stops[shard].set()
+        while running - self.stopped and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        for shard, process in self.processes.items():
+            await loop.run_in_executor(None, process.join, max(0, deadline - loop.time()))
+            if process.is_alive():
+                self.logger.error(f"shard{shard} pid:{process.pid} did not stop in {timeout}s, terminating")
+                process.terminate()
+                await loop.run_in_executor(None, process.join)
+        self.executor.shutdown(wait=False)
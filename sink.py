@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from metrics import Metrics
+from health import Health
+from profiler import Profiler
+from spool import Spool
+
+
+class DataBaseSink:
+    '''
+    Async front end for a blocking database (MongoDataBase, MysqlDataBase).
+    Records are queued on the event loop and written by a dedicated worker
+    thread, so the exchange readers never wait on database I/O.
+    One thread per backend keeps the driver connection single threaded.
+    With batch_size > 1 records are grouped per collection and written with
+    database.insert_many when batch_size is reached or flush_interval expires.
+    With a spool, records go to local disk while the database is down, not yet
+    connected or the queue is full, and are replayed in bulk once writes
+    succeed again. Spool files are written and synced on their own thread.
+    '''
+
+    def __init__(self, name: str, database, queue_size: int = Config.sink_QUEUE_SIZE,
+                 batch_size: int = 1, flush_interval: float = 0, spool: Spool = None):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.name = name
+        self.database = database
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=name)
+        self.task = None
+        self.replay_task = None
+        self.spool = spool
+        self.spool_executor = None
+        self.spool_buffer = []
+        self.spool_ready = asyncio.Event()
+        self.spool_idle = asyncio.Event()
+        self.spool_idle.set()
+        self.spool_size = 0
+        self.spool_task = None
+        if spool is not None:
+            self.spool_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=name + "-spool")
+        # writes go to the spool until connected and the spool is replayed
+        self.available = False
+        self.connected = asyncio.Event()
+        self.buffers = defaultdict(list)
+        self.inserted = 0
+        self.errors = 0
+        self.metrics = Metrics()
+        self.health = Health()
+        self.health.register_sink(self.name)
+        self.profiler = Profiler()
+
+    async def __run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def __spool_run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.spool_executor, func, *args)
+
+    async def connect(self):
+        await self.__run(self.database.connect)
+        self.connected.set()
+
+    async def call(self, func, *args):
+        # runs func on the database thread, e.g. schema maintenance
+        return await self.__run(func, *args)
+
+    def start(self):
+        self.task = asyncio.create_task(self.__writer())
+        if self.spool is not None:
+            self.replay_task = asyncio.create_task(self.__replayer())
+            self.spool_task = asyncio.create_task(self.__spooler())
+
+    async def insert(self, collection: str, record):
+        if self.spool is not None and (not self.available or self.queue.full()):
+            if len(self.spool_buffer) >= self.queue.maxsize:
+                # the disk does not keep up either
+                self.errors += 1
+                self.metrics.insert_errors.inc(backend=self.name)
+                return
+            self.spool_buffer.append((collection, record))
+            self.spool_idle.clear()
+            self.spool_ready.set()
+            return
+        # only waits when the queue is full
+        await self.queue.put((collection, record))
+
+    def __append(self, collection: str, records: list):
+        # runs on the spool thread
+        try:
+            self.spool.append(collection, records)
+        except Exception as e:
+            self.errors += len(records)
+            self.logger.error(f"Error in {self.name} spool, {len(records)} records lost:{e}->{traceback.format_exc()}")
+        else:
+            self.metrics.records_spooled.inc(len(records), backend=self.name)
+        self.spool_size = self.spool.size()
+
+    async def __spool(self, collection: str, records: list):
+        await self.__spool_run(self.__append, collection, records)
+
+    async def __spool_buffer(self):
+        buffer, self.spool_buffer = self.spool_buffer, []
+        self.spool_ready.clear()
+        groups = defaultdict(list)
+        for collection, record in buffer:
+            groups[collection].append(record)
+        for collection, records in groups.items():
+            await self.__spool(collection, records)
+
+    async def __spooler(self):
+        while True:
+            await self.spool_ready.wait()
+            await self.__spool_buffer()
+            if not self.spool_buffer:
+                self.spool_idle.set()
+
+    async def __write(self, collection: str, records: list):
+        start = time.perf_counter()
+        if self.spool is not None and not self.available:
+            await self.__spool(collection, records)
+            for _ in records:
+                self.queue.task_done()
+            return
+        if not self.connected.is_set():
+            await self.connected.wait()
+        try:
+            if self.batch_size > 1:
+                await self.__run(self.database.insert_many, collection, records)
+            else:
+                for record in records:
+                    await self.__run(self.database.insert, collection, record)
+        except Exception as e:
+            self.errors += len(records)
+            self.metrics.insert_errors.inc(len(records), backend=self.name)
+            self.health.error(self.name, e)
+            self.logger.error(
+                f"Error in {self.name} writer, {len(records)} {collection} records:{e}->{traceback.format_exc()}")
+            if self.spool is not None:
+                self.available = False
+                await self.__spool(collection, records)
+        else:
+            self.inserted += len(records)
+            self.health.inserted(self.name, records)
+            for record in records:
+                self.metrics.records_inserted.inc(backend=self.name, exchange=record.source, pair=record.pair)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.insert_latency.observe(elapsed, backend=self.name)
+            self.profiler.record(self.name + ".insert", elapsed)
+            for _ in records:
+                self.queue.task_done()
+
+    async def __replay(self, path: str):
+        records = await self.__run(self.spool.read, path)
+        groups = defaultdict(list)
+        for collection, record in records:
+            groups[collection].append(record)
+        batch_size = max(self.batch_size, Config.spool_REPLAY_BATCH_SIZE)
+        for collection, group in groups.items():
+            for i in range(0, len(group), batch_size):
+                batch = group[i:i + batch_size]
+                await self.__run(self.database.insert_many, collection, batch)
+                self.metrics.records_replayed.inc(len(batch), backend=self.name)
+        await self.__spool_run(self.spool.remove, path)
+        self.spool_size = await self.__spool_run(self.spool.size)
+        self.logger.info(f"{self.name} replayed {len(records)} records from {path}")
+
+    async def __replayer(self):
+        while True:
+            await asyncio.sleep(Config.spool_REPLAY_INTERVAL)
+            await self.__spool_run(self.spool.sync)
+            if not self.connected.is_set() or self.queue.qsize() > self.queue.maxsize // 2:
+                continue
+            await self.__spool_run(self.spool.rotate)
+            replayed = True
+            for path in await self.__spool_run(self.spool.closed_segments):
+                try:
+                    await self.__replay(path)
+                except Exception as e:
+                    replayed = False
+                    self.available = False
+                    self.health.error(self.name, e)
+                    self.logger.error(f"Error replaying {path} into {self.name}:{e}")
+                    break
+            if replayed and not self.available:
+                self.logger.info(f"{self.name} available")
+                self.available = True
+
+    async def __writer(self):
+        loop = asyncio.get_running_loop()
+        buffers = self.buffers
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - loop.time())
+            try:
+                collection, record = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                for collection in list(buffers):
+                    await self.__write(collection, buffers.pop(collection))
+                deadline = None
+                continue
+            buffers[collection].append(record)
+            if len(buffers[collection]) >= self.batch_size:
+                await self.__write(collection, buffers.pop(collection))
+            if not buffers:
+                deadline = None
+            elif deadline is None:
+                deadline = loop.time() + self.flush_interval
+
+    async def close(self, timeout: float = Config.sink_CLOSE_TIMEOUT):
+        if self.task is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                self.logger.error(
+                    f"{self.name} close timeout, {self.queue.qsize()} records not written")
+            self.task.cancel()
+            self.task = None
+        if self.replay_task is not None:
+            self.replay_task.cancel()
+            self.replay_task = None
+        if self.spool is not None:
+            # whatever could not be written is kept for the next start
+            for collection in list(self.buffers):
+                await self.__spool(collection, self.buffers.pop(collection))
+            while not self.queue.empty():
+                self.spool_buffer.append(self.queue.get_nowait())
+            if self.spool_task is not None:
+                if self.spool_buffer:
+                    self.spool_idle.clear()
+                    self.spool_ready.set()
+                await self.spool_idle.wait()
+                self.spool_task.cancel()
+                self.spool_task = None
+            else:
+                await self.__spool_buffer()
+            await self.__spool_run(self.spool.close)
+            self.spool_executor.shutdown(wait=True)
+        try:
+            if self.connected.is_set():
+                await self.__run(self.database.close)
+        finally:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,126 @@
+import logging
+import mmap
+import os
+import time
+
+import codec
+from config import Config
+from metrics import Metrics
+from records import RECORD_TYPES
+
+'''
+Append-only local spool used by a sink while its database is down or slow.
+Records are written as json lines to numbered segment files, fsync is batched
+every Config.spool_FSYNC_INTERVAL seconds and the oldest segments are deleted
+when the spool grows over Config.spool_MAX_BYTES.
+'''
+
+
+class Spool:
+
+    def __init__(self, name: str, directory: str = Config.spool_DIRECTORY,
+                 segment_bytes: int = Config.spool_SEGMENT_BYTES,
+                 max_bytes: int = Config.spool_MAX_BYTES,
+                 fsync_interval: float = Config.spool_FSYNC_INTERVAL,
+                 use_mmap: bool = Config.spool_MMAP):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.name = name
+        self.directory = os.path.join(directory, name)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_interval
+        self.use_mmap = use_mmap
+        os.makedirs(self.directory, exist_ok=True)
+        self.file = None
+        self.file_path = None
+        self.file_bytes = 0
+        self.last_fsync = 0.0
+        self.dirty = False
+        self.metrics = Metrics()
+        segments = self.segments()
+        self.sequence = int(os.path.basename(segments[-1]).split(".")[0]) if segments else 0
+        if segments:
+            self.logger.info(f"Spool {self.directory} has {len(segments)} segments to replay")
+
+    def segments(self) -> list:
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if name.endswith(".spool"))
+
+    def closed_segments(self) -> list:
+        return [path for path in self.segments() if path != self.file_path]
+
+    def size(self) -> int:
+        return sum(os.path.getsize(path) for path in self.segments())
+
+    def __open(self):
+        self.sequence += 1
+        self.file_path = os.path.join(self.directory, f"{self.sequence:012d}.spool")
+        self.file = open(self.file_path, "ab")
+        self.file_bytes = 0
+
+    def append(self, collection: str, records: list):
+        if self.file is None:
+            self.__open()
+        lines = b"".join(
+            codec.dumps([collection, type(record).__name__, list(record)]).encode() + b"\n" for record in records)
+        self.file.write(lines)
+        self.file_bytes += len(lines)
+        self.dirty = True
+        if time.monotonic() - self.last_fsync >= self.fsync_interval:
+            self.sync()
+        if self.file_bytes >= self.segment_bytes:
+            self.rotate()
+            self.__enforce_limit()
+
+    def sync(self):
+        if self.file is not None and self.dirty:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.dirty = False
+        self.last_fsync = time.monotonic()
+
+    def rotate(self):
+        # closes the current segment so it can be replayed
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+            self.file_path = None
+
+    def __enforce_limit(self):
+        segments = self.closed_segments()
+        total = self.size()
+        while total > self.max_bytes and segments:
+            oldest = segments.pop(0)
+            size = os.path.getsize(oldest)
+            os.remove(oldest)
+            total -= size
+            self.metrics.spool_lost_bytes.inc(size, backend=self.name)
+            self.logger.error(f"Spool {self.directory} over {self.max_bytes} bytes, dropped segment {oldest} ({size} bytes)")
+
+    def read(self, path: str) -> list:
+        records = []
+        with open(path, "rb") as file:
+            if self.use_mmap and os.path.getsize(path) > 0:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    lines = iter(mapped.readline, b"")
+                    records = [self.__decode(line) for line in lines if line.strip()]
+            else:
+                records = [self.__decode(line) for line in file if line.strip()]
+        return [record for record in records if record is not None]
+
+    def __decode(self, line: bytes):
+        try:
+            collection, kind, values = codec.loads(line)
+            return collection, RECORD_TYPES[kind](*values)
+        except Exception as e:
+            # a torn write at the end of a segment after a crash
+            self.logger.error(f"Spool skipping unreadable line:{e}")
+            return None
+
+    def remove(self, path: str):
+        os.remove(path)
+
+    def close(self):
+        self.rotate()
@@ -33,8 +33,11 @@ CREATE TABLE `candles` (
   `high` float NOT NULL,
   `volume` float NOT NULL,
   `ts` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
-   KEY `lastN` (`epoch`,`pair`,`frame`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+   PRIMARY KEY (`epoch`,`source`,`pair`,`frame`),
+   KEY `lastN` (`pair`,`frame`,`epoch`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8
+/*!50100 PARTITION BY RANGE (`epoch`)
+(PARTITION pmax VALUES LESS THAN MAXVALUE ENGINE = InnoDB) */;
 /*!40101 SET character_set_client = @saved_cs_client */;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
@@ -0,0 +1,16 @@
+-- unique record keys used to drop rows replayed twice from the local spool
+-- remove existing duplicates first, ALTER IGNORE is not available on 5.7
+
+ALTER TABLE `tickers` ADD COLUMN `epoch_ms` bigint(20) NOT NULL DEFAULT 0;
+
+CREATE TABLE `tickers_dedup` LIKE `tickers`;
+ALTER TABLE `tickers_dedup` ADD UNIQUE KEY `record` (`source`,`pair`,`epoch`,`epoch_ms`);
+INSERT IGNORE INTO `tickers_dedup` SELECT * FROM `tickers`;
+RENAME TABLE `tickers` TO `tickers_old`, `tickers_dedup` TO `tickers`;
+DROP TABLE `tickers_old`;
+
+CREATE TABLE `candles_dedup` LIKE `candles`;
+ALTER TABLE `candles_dedup` ADD UNIQUE KEY `record` (`source`,`pair`,`frame`,`epoch`);
+INSERT IGNORE INTO `candles_dedup` SELECT * FROM `candles`;
+RENAME TABLE `candles` TO `candles_old`, `candles_dedup` TO `candles`;
+DROP TABLE `candles_old`;
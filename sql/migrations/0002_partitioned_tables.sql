@@ -0,0 +1,91 @@
+-- clustered primary key led by epoch, inserts append at the end of the index,
+-- and RANGE partitions on epoch managed by partitions.py (created ahead, dropped by retention)
+-- every unique key of a partitioned table must contain epoch, the record key becomes the primary key
+-- requires 0001_unique_record_keys.sql
+--
+-- the new tables are split into daily partitions from the oldest migrated row to today
+-- before the history is copied, so every row lands in its own partition and pmax stays
+-- empty. Pass 'month' to split_pmax when Config.mysql_PARTITION_PERIOD is month.
+-- On start up PartitionManager only adds the partitions ahead, expired ones are dropped
+-- by the retention.
+
+SET time_zone = '+00:00';
+
+DROP PROCEDURE IF EXISTS `split_pmax`;
+DELIMITER //
+CREATE PROCEDURE `split_pmax`(IN target VARCHAR(64), IN source VARCHAR(64), IN period VARCHAR(5))
+BEGIN
+  DECLARE start DATE;
+  DECLARE stop DATE;
+  DECLARE finish DATE;
+  DECLARE parts TEXT DEFAULT '';
+  SET @oldest = NULL;
+  SET @query = CONCAT('SELECT MIN(`epoch`) INTO @oldest FROM `', source, '`');
+  PREPARE statement FROM @query;
+  EXECUTE statement;
+  DEALLOCATE PREPARE statement;
+  IF @oldest IS NOT NULL THEN
+    SET start = DATE(FROM_UNIXTIME(@oldest));
+    SET stop = UTC_DATE();
+    IF period = 'month' THEN
+      SET start = DATE_FORMAT(start, '%Y-%m-01');
+      SET stop = DATE_FORMAT(stop, '%Y-%m-01');
+    END IF;
+    WHILE start <= stop DO
+      SET finish = IF(period = 'month', start + INTERVAL 1 MONTH, start + INTERVAL 1 DAY);
+      SET parts = CONCAT(parts, 'PARTITION `p', DATE_FORMAT(start, IF(period = 'month', '%Y%m', '%Y%m%d')),
+                         '` VALUES LESS THAN (', UNIX_TIMESTAMP(finish), '), ');
+      SET start = finish;
+    END WHILE;
+    SET @query = CONCAT('ALTER TABLE `', target, '` REORGANIZE PARTITION pmax INTO (',
+                        parts, 'PARTITION pmax VALUES LESS THAN MAXVALUE)');
+    PREPARE statement FROM @query;
+    EXECUTE statement;
+    DEALLOCATE PREPARE statement;
+  END IF;
+END //
+DELIMITER ;
+
+CREATE TABLE `tickers_partitioned` (
+  `epoch` bigint(20) NOT NULL,
+  `pair` varchar(16) NOT NULL,
+  `source` varchar(16) NOT NULL,
+  `last` float NOT NULL,
+  `ask` float NOT NULL,
+  `bid` float NOT NULL,
+  `ts` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `epoch_ms` bigint(20) NOT NULL DEFAULT 0,
+   PRIMARY KEY (`epoch`,`source`,`pair`,`epoch_ms`),
+   KEY `lastN` (`pair`,`epoch`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8
+PARTITION BY RANGE (`epoch`) (PARTITION pmax VALUES LESS THAN MAXVALUE);
+CALL split_pmax('tickers_partitioned', 'tickers', 'day');
+INSERT IGNORE INTO `tickers_partitioned` (`epoch`,`pair`,`source`,`last`,`ask`,`bid`,`ts`,`epoch_ms`)
+  SELECT `epoch`,`pair`,`source`,`last`,`ask`,`bid`,`ts`,`epoch_ms` FROM `tickers` ORDER BY `epoch`;
+RENAME TABLE `tickers` TO `tickers_old`, `tickers_partitioned` TO `tickers`;
+DROP TABLE `tickers_old`;
+
+CREATE TABLE `candles_partitioned` (
+  `epoch` bigint(20) NOT NULL,
+  `pair` varchar(16) NOT NULL,
+  `frame` int(11) NOT NULL,
+  `source` varchar(16) NOT NULL,
+  `open` float NOT NULL,
+  `close` float NOT NULL,
+  `low` float NOT NULL,
+  `high` float NOT NULL,
+  `volume` float NOT NULL,
+  `ts` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+   PRIMARY KEY (`epoch`,`source`,`pair`,`frame`),
+   KEY `lastN` (`pair`,`frame`,`epoch`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8
+PARTITION BY RANGE (`epoch`) (PARTITION pmax VALUES LESS THAN MAXVALUE);
+CALL split_pmax('candles_partitioned', 'candles', 'day');
+INSERT IGNORE INTO `candles_partitioned` (`epoch`,`pair`,`frame`,`source`,`open`,`close`,`low`,`high`,`volume`,`ts`)
+  SELECT `epoch`,`pair`,`frame`,`source`,`open`,`close`,`low`,`high`,`volume`,`ts` FROM `candles` ORDER BY `epoch`;
+RENAME TABLE `candles` TO `candles_old`, `candles_partitioned` TO `candles`;
+DROP TABLE `candles_old`;
+
+DROP PROCEDURE `split_pmax`;
+
+-- ticker_windows is new, create it from sql/ticker_windows_scheme.sql
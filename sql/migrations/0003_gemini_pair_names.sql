@@ -0,0 +1,11 @@
+-- Gemini candles were stored under the exchange symbol (BTCUSD), they now use the
+-- normalized pair (USD_BTC) like every other feed. One pair of statements per Gemini
+-- pair of the feeds file, helpers/migrate_gemini_pairs.py does the same for every
+-- configured pair and for Mongo.
+-- bars stored under both names are kept under the new one, written by the running feed
+
+UPDATE IGNORE `candles` SET `pair`='USD_BTC' WHERE `source`='gemini' AND `pair`='BTCUSD';
+DELETE FROM `candles` WHERE `source`='gemini' AND `pair`='BTCUSD';
+
+UPDATE IGNORE `candles` SET `pair`='USD_ETH' WHERE `source`='gemini' AND `pair`='ETHUSD';
+DELETE FROM `candles` WHERE `source`='gemini' AND `pair`='ETHUSD';
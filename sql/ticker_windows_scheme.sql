@@ -0,0 +1,27 @@
+--
+-- Table structure for table `ticker_windows`
+-- written when Config.conflation_WINDOWS is set, one row per pair and conflation window
+--
+
+DROP TABLE IF EXISTS `ticker_windows`;
+CREATE TABLE `ticker_windows` (
+  `epoch` bigint(20) NOT NULL,
+  `pair` varchar(16) NOT NULL,
+  `frame` int(11) NOT NULL,
+  `source` varchar(16) NOT NULL,
+  `count` int(11) NOT NULL,
+  `last_min` float NOT NULL,
+  `last_max` float NOT NULL,
+  `last` float NOT NULL,
+  `bid_min` float NOT NULL,
+  `bid_max` float NOT NULL,
+  `bid` float NOT NULL,
+  `ask_min` float NOT NULL,
+  `ask_max` float NOT NULL,
+  `ask` float NOT NULL,
+  `ts` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+   PRIMARY KEY (`epoch`,`source`,`pair`,`frame`),
+   KEY `lastN` (`pair`,`frame`,`epoch`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8
+/*!50100 PARTITION BY RANGE (`epoch`)
+(PARTITION pmax VALUES LESS THAN MAXVALUE ENGINE = InnoDB) */;
@@ -30,8 +30,12 @@ CREATE TABLE `tickers` (
   `ask` float NOT NULL,
   `bid` float NOT NULL,
   `ts` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
-   KEY `lastN` (`epoch`,`pair`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+  `epoch_ms` bigint(20) NOT NULL DEFAULT 0,
+   PRIMARY KEY (`epoch`,`source`,`pair`,`epoch_ms`),
+   KEY `lastN` (`pair`,`epoch`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8
+/*!50100 PARTITION BY RANGE (`epoch`)
+(PARTITION pmax VALUES LESS THAN MAXVALUE ENGINE = InnoDB) */;
 /*!40101 SET character_set_client = @saved_cs_client */;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import random
+import traceback
+from collections import defaultdict
+
+from config import Config
+
+
+class Supervisor:
+    '''
+    Runs every feed in its own task and restarts only the feed that failed or
+    returned, waiting an exponential backoff with jitter between restarts.
+    '''
+
+    def __init__(self, base_delay: float = Config.supervisor_BASE_DELAY,
+                 max_delay: float = Config.supervisor_MAX_DELAY,
+                 reset_after: float = Config.supervisor_RESET_AFTER):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.reset_after = reset_after
+        self.feeds = {}
+        self.tasks = {}
+        self.restarts = defaultdict(int)
+
+    def add(self, name: str, factory):
+        # factory returns a new coroutine on every call
+        self.feeds[name] = factory
+
+    def start(self):
+        for name, factory in self.feeds.items():
+            self.tasks[name] = asyncio.create_task(self.__supervise(name, factory))
+
+    async def wait(self):
+        await asyncio.gather(*self.tasks.values())
+
+    async def stop(self):
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks = {}
+
+    def stats(self) -> dict:
+        return {name: {'restarts': self.restarts[name], 'running': name in self.tasks and not self.tasks[name].done()}
+                for name in self.feeds}
+
+    def __delay(self, failures: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** failures)
+        return random.uniform(delay / 2, delay)
+
+    async def __supervise(self, name: str, factory):
+        loop = asyncio.get_running_loop()
+        failures = 0
+        while True:
+            started = loop.time()
+            try:
+                await factory()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Feed {name} failed:{e}->{traceback.format_exc()}")
+            else:
+                self.logger.warning(f"Feed {name} returned")
+            if loop.time() - started > self.reset_after:
+                failures = 0
+            delay = self.__delay(failures)
+            failures += 1
+            self.restarts[name] += 1
+            self.logger.info(f"Restarting feed {name} in {delay:.1f}s, restarts:{self.restarts[name]}")
+            await asyncio.sleep(delay)
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import os
+import traceback
+from typing import NamedTuple
+
+from aiohttp import ClientSession, ClientTimeout
+
+import codec
+from config import Config
+from metrics import Metrics
+from singleton import Singleton
+
+'''
+One registry for the instruments of every exchange. Records always carry the
+normalized pair (base_quote, e.g. USDT_BTC); the exchange symbol and, for
+id based feeds, the numeric id come from here. Exchange metadata is loaded
+from a snapshot on disk (Config.symbols_SNAPSHOT) and optionally refreshed
+from the exchange REST APIs in the background.
+'''
+
+# exchange symbol of a (base, quote) pair
+SYMBOL_FORMATS = {
+    "poloniex": "{base}_{quote}",
+    "bittrex": "{quote}-{base}",
+    "gemini": "{quote}{base}",
+}
+
+
+class Instrument(NamedTuple):
+    exchange: str
+    pair: str
+    symbol: str
+    base: str
+    quote: str
+    id: int = None
+
+
+def pair_name(base: str, quote: str) -> str:
+    return base + "_" + quote
+
+
+class SymbolRegistry(metaclass=Singleton):
+
+    def __init__(self, path: str = Config.symbols_SNAPSHOT):
+        self.logger = logging.getLogger(
+            Config.LOGGING_NAME + "." + str(__name__))
+        self.path = path
+        # exchange -> {pair: Instrument}, {symbol: Instrument}, {id: Instrument}
+        self.pairs = {}
+        self.symbols = {}
+        self.ids = {}
+        self.unknown_ids = set()
+        # bumped whenever the instruments of an exchange are replaced, feeds rebuild their id maps
+        self.version = 0
+        self.refresh_requested = asyncio.Event()
+        self.metrics = Metrics()
+        if os.path.exists(path):
+            self.load(path)
+        else:
+            self.logger.warning(f"Symbol snapshot {path} not found, ids unknown until a refresh")
+
+    def add(self, instrument: Instrument):
+        self.pairs.setdefault(instrument.exchange, {})[instrument.pair] = instrument
+        self.symbols.setdefault(instrument.exchange, {})[instrument.symbol] = instrument
+        if instrument.id is not None:
+            self.ids.setdefault(instrument.exchange, {})[instrument.id] = instrument
+
+    def replace(self, exchange: str, instruments: list):
+        self.pairs[exchange] = {}
+        self.symbols[exchange] = {}
+        self.ids[exchange] = {}
+        for instrument in instruments:
+            self.add(instrument)
+        self.version += 1
+
+    def instrument(self, exchange: str, base: str, quote: str) -> Instrument:
+        '''
+        instrument of a configured pair, built from the symbol format when
+        the exchange has no metadata for it
+        '''
+        pair = pair_name(base, quote)
+        instrument = self.pairs.get(exchange, {}).get(pair)
+        if instrument is None:
+            symbol = SYMBOL_FORMATS[exchange].format(base=base, quote=quote)
+            instrument = Instrument(exchange, pair, symbol, base, quote)
+            self.add(instrument)
+        return instrument
+
+    def by_symbol(self, exchange: str, symbol: str) -> Instrument:
+        return self.symbols.get(exchange, {}).get(symbol)
+
+    def known_ids(self, exchange: str) -> set:
+        return set(self.ids.get(exchange, {}))
+
+    def by_id(self, exchange: str, instrument_id: int) -> Instrument:
+        instrument = self.ids.get(exchange, {}).get(instrument_id)
+        if instrument is None and (exchange, instrument_id) not in self.unknown_ids:
+            # reported once, a refresh picks up markets listed after the snapshot
+            self.unknown_ids.add((exchange, instrument_id))
+            self.metrics.unknown_symbols.inc(exchange=exchange)
+            self.logger.warning(f"Unknown {exchange} market id {instrument_id}")
+            self.refresh_requested.set()
+        return instrument
+
+    def load(self, path: str):
+        with open(path, "r") as file:
+            snapshot = json.load(file)
+        for exchange, instruments in snapshot.items():
+            self.replace(exchange, [Instrument(exchange=exchange, pair=pair_name(item['base'], item['quote']), **item)
+                                    for item in instruments])
+        self.logger.info(f"Loaded symbols {({exchange: len(items) for exchange, items in snapshot.items()})} from {path}")
+
+    def save(self, path: str = None):
+        path = path or self.path
+        snapshot = {exchange: [{'symbol': instrument.symbol, 'base': instrument.base,
+                                'quote': instrument.quote, 'id': instrument.id}
+                               for instrument in sorted(symbols.values(), key=lambda instrument: instrument.symbol)]
+                    for exchange, symbols in sorted(self.symbols.items())}
+        # written aside and renamed, a crash never leaves half a snapshot
+        with open(path + ".tmp", "w") as file:
+            json.dump(snapshot, file, indent=4)
+        os.replace(path + ".tmp", path)
+
+    async def __fetch_poloniex(self, session: ClientSession) -> list:
+        async with session.get("https://poloniex.com/public?command=returnTicker") as response:
+            markets = codec.loads(await response.read())
+        instruments = []
+        for symbol, market in markets.items():
+            base, quote = symbol.split("_")
+            instruments.append(Instrument("poloniex", pair_name(base, quote), symbol, base, quote, int(market['id'])))
+        return instruments
+
+    async def __fetch_bittrex(self, session: ClientSession) -> list:
+        async with session.get("https://api.bittrex.com/v3/markets") as response:
+            markets = codec.loads(await response.read())
+        # bittrex names the traded currency base, here base is the currency it is priced in
+        return [Instrument("bittrex", pair_name(market['quoteCurrencySymbol'], market['baseCurrencySymbol']),
+                           market['symbol'], market['quoteCurrencySymbol'], market['baseCurrencySymbol'])
+                for market in markets]
+
+    async def refresh(self, exchanges: list = ("poloniex", "bittrex")) -> list:
+        '''
+        returns the exchanges refreshed, the snapshot is saved only when one was
+        '''
+        fetchers = {"poloniex": self.__fetch_poloniex, "bittrex": self.__fetch_bittrex}
+        timeout = ClientTimeout(total=Config.symbols_REFRESH_TIMEOUT)
+        refreshed = []
+        async with ClientSession(timeout=timeout) as session:
+            for exchange in exchanges:
+                try:
+                    instruments = await fetchers[exchange](session)
+                except Exception as e:
+                    self.logger.error(f"Error refreshing {exchange} symbols:{e}->{traceback.format_exc()}")
+                    continue
+                self.replace(exchange, instruments)
+                refreshed.append(exchange)
+                self.logger.info(f"Refreshed {len(instruments)} {exchange} symbols")
+        if refreshed:
+            # ids still missing stay reported and do not ask for another refresh
+            self.unknown_ids = {(exchange, instrument_id) for exchange, instrument_id in self.unknown_ids
+                                if instrument_id not in self.ids.get(exchange, {})}
+            self.save()
+        return refreshed
+
+    async def ensure(self, exchanges: list = ("poloniex", "bittrex")):
+        '''
+        refreshes once when there is no snapshot, without it id based feeds record nothing
+        '''
+        if os.path.exists(self.path):
+            return
+        if not await self.refresh(exchanges):
+            self.logger.error(f"Symbol snapshot {self.path} not found and the refresh failed, "
+                              f"id based feeds record nothing until a refresh succeeds, "
+                              f"run helpers/refresh_symbols.py or set Config.symbols_REFRESH_INTERVAL")
+
+    async def run(self, interval: float = Config.symbols_REFRESH_INTERVAL,
+                  min_interval: float = Config.symbols_MIN_REFRESH_INTERVAL):
+        '''
+        background refresh every interval seconds, or sooner when an unknown id shows up.
+        Refreshes are at least min_interval apart, doubled up to interval while they fail.
+        '''
+        delay = min_interval
+        while True:
+            try:
+                await asyncio.wait_for(self.refresh_requested.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self.refresh_requested.clear()
+            if await self.refresh():
+                delay = min_interval
+            else:
+                delay = min(delay * 2, interval)
+            await asyncio.sleep(delay)
@@ -0,0 +1,26 @@
+import time
+from datetime import datetime
+from functools import lru_cache
+
+from config import Config
+
+
+@lru_cache(maxsize=Config.TS_CACHE_SIZE)
+def format_ts(epoch: int) -> str:
+    # epoch is whole seconds, thousands of records share the same string
+    return datetime.utcfromtimestamp(epoch).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def milliseconds() -> bool:
+    # without conflation a pair gets several tickers per second, only the
+    # milliseconds keep their record keys apart
+    return Config.TIMESTAMP_MILLISECONDS or not Config.conflation_INTERVAL
+
+
+def stamp() -> tuple:
+    '''
+    arrival time of a message as (epoch seconds, epoch milliseconds),
+    milliseconds is None unless milliseconds() is set
+    '''
+    epoch_ms = time.time_ns() // 1000000
+    return epoch_ms // 1000, epoch_ms if milliseconds() else None